@@ -0,0 +1,105 @@
+#
+# NAME
+#
+#   gtkstub.py
+#
+# DESCRIPTION
+#
+#   Wren GUI benchmark GTK stand-in. Installs a minimal "gi.repository" whose
+#   widgets accept (and count) any method call, so the GUI render path can be
+#   measured without GTK or a display.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+import sys, types
+
+# widget method calls made (e.g. set_text, queue_draw), for per-tick counts
+calls = [0]
+
+class StubWidget(object):
+  # any method exists, does nothing, and returns None
+
+  def __init__(self, name=None):
+    self.name = name
+
+  def __getattr__(self, name):
+    def method(*args, **kwargs):
+      calls[0] += 1
+    return method
+
+
+class StubBuilder(object):
+
+  def __init__(self):
+    self.objects = {}
+
+  def add_from_file(self, path):
+    pass
+
+  def add_from_string(self, definition):
+    pass
+
+  def connect_signals(self, handler):
+    pass
+
+  def get_object(self, name):
+    if name not in self.objects:
+      self.objects[name] = StubWidget(name)
+    return self.objects[name]
+
+
+def _source(*args, **kwargs):
+  # stand-in for main loop source functions (idle_add, timeout_add, ...)
+  return 0
+
+
+def install():
+  # register stub gi modules (replacing any real ones not yet imported)
+  gi = types.ModuleType('gi')
+  repository = types.ModuleType('gi.repository')
+  gi.repository = repository
+
+  Gtk = types.ModuleType('gi.repository.Gtk')
+  Gtk.Builder = StubBuilder
+  Gtk.Buildable = StubWidget()
+  Gtk.StateFlags = StubWidget()
+  Gtk.main_quit = _source
+
+  GLib = types.ModuleType('gi.repository.GLib')
+  for name in ['idle_add', 'timeout_add', 'timeout_add_seconds',
+               'io_add_watch', 'child_watch_add', 'source_remove',
+               'threads_init']:
+    setattr(GLib, name, _source)
+  GLib.IO_IN, GLib.IO_HUP, GLib.PRIORITY_DEFAULT = 1, 16, 0
+
+  Gdk = types.ModuleType('gi.repository.Gdk')
+  Gdk.KEY_Escape = 0xff1b
+
+  repository.Gtk = Gtk
+  repository.GLib = repository.GObject = GLib
+  repository.Gdk = Gdk
+  sys.modules.update({'gi': gi,
+                      'gi.repository': repository,
+                      'gi.repository.Gtk': Gtk,
+                      'gi.repository.GLib': GLib,
+                      'gi.repository.GObject': GLib,
+                      'gi.repository.Gdk': Gdk})
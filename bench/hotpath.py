@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+#
+# NAME
+#
+#   hotpath.py
+#
+# DESCRIPTION
+#
+#   Wren GUI sampling and rendering hot path benchmark. Runs the work done on
+#   every usage update (MemoryUsage, DiskUsage, bytes_to_human, and the
+#   MainGlade.set_usage render path) against fixture /proc/meminfo and
+#   mountinfo files, with GTK stubbed, and reports latency percentiles,
+#   processes spawned, widget calls, and allocations per tick. Exits with a
+#   non-zero status if a tick exceeds its budget, so it can be used as a
+#   regression check.
+#
+#   Runs on any Linux machine (no Wren platform, GTK, or root required).
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+from __future__ import print_function
+import argparse, gc, os, platform, shutil, subprocess, sys, tempfile, time
+
+PATH_BENCH = os.path.dirname(os.path.abspath(__file__))
+PATH_ROOT = os.path.dirname(PATH_BENCH)
+PATH_FIXTURES = os.path.join(PATH_BENCH, 'fixtures')
+
+# application modules resolve their files relative to sys.path[0]
+sys.path.insert(0, PATH_ROOT)
+
+import gtkstub
+gtkstub.install()
+
+from lib import usage
+from lib.usage import MemInfoSampler, MountIndex, MemoryUsage, DiskUsage, \
+  bytes_to_human
+from lib.mainglade import MainGlade
+
+# ticks measured (after TICKS_WARMUP unmeasured ticks)
+TICKS = 1000
+TICKS_WARMUP = 50
+
+# per tick budget (99th percentile, in seconds) and processes allowed
+TICK_TARGET = 0.005
+MAX_SPAWNED_PER_TICK = 0
+
+# measured stages [name, part of a tick]
+STAGES = [['MemoryUsage', True],
+          ['DiskUsage', True],
+          ['set_usage', True],
+          ['tick', False],
+          ['bytes_to_human', False]]
+
+
+class Fixture:
+
+  def __init__(self):
+    # temporary meminfo and mountinfo files, and mount point directories
+    # (file system readings come from the temporary directory)
+    self.directory = tempfile.mkdtemp(prefix='wren-bench.')
+    mount_dir = os.path.join(self.directory, 'mnt')
+    for name in ['00-device', '04-save']:
+      os.makedirs(os.path.join(mount_dir, name))
+
+    with open(os.path.join(PATH_FIXTURES, 'meminfo')) as meminfo_file:
+      self.meminfo = meminfo_file.read().splitlines()
+    self.meminfo_path = os.path.join(self.directory, 'meminfo')
+    self.vary(0)
+
+    with open(os.path.join(PATH_FIXTURES, 'mountinfo')) as mountinfo_file:
+      mountinfo = mountinfo_file.read()
+    self.mountinfo_path = os.path.join(self.directory, 'mountinfo')
+    with open(self.mountinfo_path, 'w') as mountinfo_file:
+      mountinfo_file.write(mountinfo.replace(
+        '@MOUNT_DIR@', mount_dir.replace(' ', '\\040')))
+
+    self.meminfo_sampler = MemInfoSampler(self.meminfo_path)
+    self.mount_index = MountIndex(self.mountinfo_path, mount_dir)
+
+  def vary(self, tick):
+    # rewrite meminfo with changing free memory (as between real readings)
+    lines = []
+    for line in self.meminfo:
+      if line.startswith('MemFree:') or line.startswith('Cached:'):
+        name, value, unit = line.split()
+        value = int(value) + (tick % 97) * 4096
+        line = '%-16s%8d %s' % (name, value, unit)
+      lines.append(line)
+    with open(self.meminfo_path, 'w') as meminfo_file:
+      meminfo_file.write('\n'.join(lines) + '\n')
+
+  def close(self):
+    self.meminfo_sampler.close()
+    self.mount_index.close()
+    shutil.rmtree(self.directory)
+
+
+class SpawnCounter:
+
+  def __init__(self):
+    # count process creation through subprocess and os
+    self.count = 0
+    self.patched = []
+    self._patch(subprocess.Popen, '_execute_child')
+    for name in ['fork', 'system', 'popen', 'spawnv', 'spawnve', 'execv',
+                 'posix_spawn', 'posix_spawnp']:
+      if hasattr(os, name):
+        self._patch(os, name)
+
+  def _patch(self, owner, name):
+    original = getattr(owner, name)
+    def counted(*args, **kwargs):
+      self.count += 1
+      return original(*args, **kwargs)
+    setattr(owner, name, counted)
+    self.patched.append((owner, name, original))
+
+  def restore(self):
+    for owner, name, original in self.patched:
+      setattr(owner, name, original)
+
+
+class AllocationCounter:
+  # allocations per tick: bytes allocated (tracemalloc) where available,
+  # otherwise net garbage-collector tracked objects created
+
+  def __init__(self):
+    try:
+      import tracemalloc
+      self.tracemalloc = tracemalloc
+      self.unit = 'bytes allocated'
+    except ImportError:
+      self.tracemalloc = None
+      self.unit = 'gc-tracked objects (net)'
+
+  def start(self):
+    if self.tracemalloc is not None:
+      self.tracemalloc.start()
+    else:
+      gc.disable()
+
+  def stop(self):
+    if self.tracemalloc is not None:
+      self.tracemalloc.stop()
+    else:
+      gc.enable()
+
+  def measure(self, function):
+    # allocations made while calling function
+    if self.tracemalloc is not None:
+      if hasattr(self.tracemalloc, 'reset_peak'):
+        self.tracemalloc.reset_peak()
+      before = self.tracemalloc.get_traced_memory()[0]
+      function()
+      return max(0, self.tracemalloc.get_traced_memory()[1] - before)
+    before = gc.get_count()[0]
+    function()
+    return gc.get_count()[0] - before
+
+
+def percentile(values, fraction):
+  # value at fraction (0.0 - 1.0) of sorted values (nearest rank)
+  return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def run(ticks):
+  fixture = Fixture()
+  # readings are taken from the fixture files
+  usage._meminfo_sampler = fixture.meminfo_sampler
+  main_glade = MainGlade()
+  spawns = SpawnCounter()
+  allocations = AllocationCounter()
+  times = dict((stage[0], []) for stage in STAGES)
+  calls = 0
+  allocated = []
+
+  try:
+    # timed ticks (stages as taken by UsageCollector.collect() and
+    # delivered to MainGlade.set_usage())
+    for tick in range(TICKS_WARMUP + ticks):
+      fixture.vary(tick)
+      calls_before = gtkstub.calls[0]
+      start = time.time()
+      memory_usage = MemoryUsage()
+      memory_time = time.time()
+      disk_usage = DiskUsage(fixture.mount_index)
+      disk_time = time.time()
+      main_glade.set_usage(memory_usage, disk_usage, disk_time)
+      end = time.time()
+
+      # label formatting alone (total, used, and free of every row, with
+      # and without a tooltip size limit)
+      values = [getattr(getattr(u, row), key)
+                for u, rows in [[memory_usage, ['ram', 'swap', 'total']],
+                                [disk_usage, ['device', 'save']]]
+                for row in rows for key in ['total', 'used', 'free']]
+      format_start = time.time()
+      for value in values:
+        try:
+          bytes_to_human(value)
+          bytes_to_human(value, 'M')
+        except ValueError:
+          pass
+      format_end = time.time()
+
+      if tick < TICKS_WARMUP:
+        continue
+      calls += gtkstub.calls[0] - calls_before
+      times['MemoryUsage'].append(memory_time - start)
+      times['DiskUsage'].append(disk_time - memory_time)
+      times['set_usage'].append(end - disk_time)
+      times['tick'].append(end - start)
+      times['bytes_to_human'].append(format_end - format_start)
+    spawned = spawns.count
+
+    # allocation ticks (measured separately; tracing slows timing)
+    def full_tick():
+      memory_usage = MemoryUsage()
+      disk_usage = DiskUsage(fixture.mount_index)
+      main_glade.set_usage(memory_usage, disk_usage, time.time())
+    allocations.start()
+    try:
+      for tick in range(ticks):
+        fixture.vary(tick)
+        allocated.append(allocations.measure(full_tick))
+    finally:
+      allocations.stop()
+  finally:
+    spawns.restore()
+    fixture.close()
+
+  return times, float(spawned) / ticks, float(calls) / ticks, allocations.unit, \
+    sorted(allocated)
+
+
+def main():
+  parser = argparse.ArgumentParser(
+    description='Benchmark the wren-gui sampling and rendering hot path.')
+  parser.add_argument('--ticks', type=int, default=TICKS,
+                      help='measured ticks (default: %d)' % TICKS)
+  parser.add_argument('--target', type=float, default=TICK_TARGET * 1000,
+                      help='maximum 99th percentile tick time in ms '
+                           '(default: %.1f)' % (TICK_TARGET * 1000))
+  args = parser.parse_args()
+  if args.ticks < 1:
+    parser.error('--ticks must be at least 1')
+
+  times, spawned, calls, allocation_unit, allocated = run(args.ticks)
+
+  print('wren-gui hot path: %d ticks, Python %s' %
+        (args.ticks, platform.python_version()))
+  print()
+  print('%-16s %10s %10s %10s %10s' % ('stage (us)', 'p50', 'p90', 'p99',
+                                       'max'))
+  for name, in_tick in STAGES:
+    values = sorted(times[name])
+    print('%-16s %10.1f %10.1f %10.1f %10.1f' %
+          ((name if in_tick else '(%s)' % name,) +
+           tuple(v * 1e6 for v in [percentile(values, 0.5),
+                                   percentile(values, 0.9),
+                                   percentile(values, 0.99),
+                                   values[-1]])))
+  print()
+  print('processes spawned per tick: %.2f' % spawned)
+  print('widget calls per tick:      %.2f' % calls)
+  print('allocations per tick:       %d p50 / %d p99 %s' %
+        (percentile(allocated, 0.5), percentile(allocated, 0.99),
+         allocation_unit))
+
+  # check budgets
+  failures = []
+  tick_p99 = percentile(sorted(times['tick']), 0.99) * 1000
+  if tick_p99 > args.target:
+    failures.append('tick p99 %.3fms exceeds target of %.3fms' %
+                    (tick_p99, args.target))
+  if spawned > MAX_SPAWNED_PER_TICK:
+    failures.append('%.2f processes spawned per tick (maximum %d)' %
+                    (spawned, MAX_SPAWNED_PER_TICK))
+  print()
+  for failure in failures:
+    print('FAIL: %s' % failure)
+  if failures:
+    return 1
+  print('OK: tick p99 %.3fms within target of %.3fms' % (tick_p99,
+                                                          args.target))
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+#
+# NAME
+#
+#   startup.py
+#
+# DESCRIPTION
+#
+#   Wren GUI startup benchmark. Launches wren-gui repeatedly with
+#   --exit-after-paint and measures the time from process start to the first
+#   painted stats. Exits with a non-zero status if the median exceeds the
+#   target, so it can be used as a regression check.
+#
+#   Requires a display and root permission (as wren-gui itself does).
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+from __future__ import print_function
+import argparse, os, subprocess, sys, time
+
+# median seconds from process start to first painted stats considered a
+# regression
+STARTUP_TARGET = 1.0
+
+# runs measured (after one unmeasured run to warm file system caches)
+STARTUP_RUNS = 5
+
+PATH_WREN_GUI = os.path.join(os.path.dirname(os.path.dirname(
+  os.path.abspath(__file__))), 'wren-gui')
+
+def measure(command):
+  # seconds from launching command to the paint time it prints
+  start = time.time()
+  output = subprocess.check_output(command)
+  return float(output.decode('utf-8').split()[-1]) - start
+
+
+def main():
+  parser = argparse.ArgumentParser(
+    description='Measure wren-gui time to first painted stats.')
+  parser.add_argument('--runs', type=int, default=STARTUP_RUNS,
+                      help='measured runs (default: %d)' % STARTUP_RUNS)
+  parser.add_argument('--target', type=float, default=STARTUP_TARGET,
+                      help='maximum median seconds (default: %.1f)'
+                           % STARTUP_TARGET)
+  args = parser.parse_args()
+
+  command = [sys.executable, PATH_WREN_GUI, '--exit-after-paint']
+  measure(command)
+  times = sorted(measure(command) for i in range(args.runs))
+  median = times[len(times) // 2]
+
+  print('runs: %d' % len(times))
+  print('min: %.3fs  median: %.3fs  max: %.3fs' % (times[0], median,
+                                                   times[-1]))
+  if median > args.target:
+    print('FAIL: median exceeds target of %.3fs' % args.target)
+    return 1
+  print('OK: median within target of %.3fs' % args.target)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
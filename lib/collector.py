@@ -0,0 +1,196 @@
+#
+# NAME
+#
+#   collector.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's background usage collector module. Takes disk and
+#   memory usage readings on a worker thread and hands the most recent
+#   reading to the GTK main loop, dropping readings the interface has not
+#   caught up with.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+from __future__ import print_function
+import os, select, threading, time, traceback
+from gi.repository import GLib
+from lib.usage import MemoryUsage, DiskUsage, MountIndex
+from lib.pressure import MemoryPressureSampler
+from lib.processes import ProcessSampler
+
+class UsageSample:
+
+  def __init__(self, sequence, memory_usage, disk_usage,
+               memory_pressure=None, processes=None):
+    self.sequence = sequence
+    self.timestamp = time.time()
+    self.memory_usage = memory_usage
+    self.disk_usage = disk_usage
+    self.memory_pressure = memory_pressure
+    self.processes = processes
+
+
+class UsageCollector(threading.Thread):
+
+  def __init__(self, sample_callback, interval=2, mount_index=None,
+               pressure_sampler=None, process_sampler=None):
+    threading.Thread.__init__(self, name='usage-collector')
+    self.daemon = True
+
+    self.sample_callback = sample_callback
+    self.listeners = []
+    self.interval = interval
+    self.mount_index = mount_index if mount_index is not None else MountIndex()
+    self.pressure_sampler = pressure_sampler if pressure_sampler is not None \
+      else MemoryPressureSampler()
+
+    # measure processes only while they are shown (see set_processes_enabled)
+    self.process_sampler = process_sampler if process_sampler is not None \
+      else ProcessSampler()
+    self.processes_enabled = False
+
+    self.stopped = False
+    self.sample_requested = False
+    self.sequence = 0
+    self.started = 0
+
+    # latest sample waiting for the main loop (and its idle source)
+    self.lock = threading.Lock()
+    self.pending = None
+    self.idle_id = None
+
+    # wake on request (pipe), on mount table changes (mountinfo POLLPRI), or
+    # on memory pressure stalls (PSI trigger POLLPRI, where supported)
+    self.wake_read_fd, self.wake_write_fd = os.pipe()
+    self.poller = select.poll()
+    self.poller.register(self.wake_read_fd, select.POLLIN)
+    self.poller.register(self.mount_index.fileno(),
+                         select.POLLPRI | select.POLLERR)
+    self.pressure_fd = self.pressure_sampler.open_trigger()
+    if self.pressure_fd is not None:
+      self.poller.register(self.pressure_fd, select.POLLPRI | select.POLLERR)
+
+  def add_listener(self, callback):
+    # call callback(sample) from the collector thread with every sample
+    # (e.g. to export readings without taking any of its own)
+    self.listeners.append(callback)
+
+  def wake(self):
+    # take a sample now instead of waiting for the interval to elapse
+    self.sample_requested = True
+    self._interrupt()
+
+  def set_processes_enabled(self, enabled):
+    # include the largest processes in samples (measured a few at a time) or
+    # stop measuring them; a sample is taken at once when enabled
+    self.processes_enabled = enabled
+    if enabled:
+      self.wake()
+
+  def set_interval(self, interval):
+    # change the sampling interval (applies to the sample being waited on)
+    self.interval = interval
+    self._interrupt()
+
+  def stop(self):
+    self.stopped = True
+    self._interrupt()
+
+  def run(self):
+    while not self.stopped:
+      self.started = time.time()
+      try:
+        sample = self.collect()
+        self._deliver(sample)
+        for listener in self.listeners:
+          listener(sample)
+      except Exception:
+        # keep collecting; a failed reading only costs one update
+        traceback.print_exc()
+      self._wait()
+
+  def collect(self):
+    # take system readings
+    self.sequence += 1
+    processes = None
+    if self.processes_enabled:
+      processes = self.process_sampler.sample()
+    elif self.process_sampler.count():
+      # measurements go stale while not shown
+      self.process_sampler.reset()
+    return UsageSample(self.sequence,
+                       memory_usage=MemoryUsage(),
+                       disk_usage=DiskUsage(self.mount_index),
+                       memory_pressure=self.pressure_sampler.sample(),
+                       processes=processes)
+
+  def _interrupt(self):
+    # wake the collector thread from its wait
+    os.write(self.wake_write_fd, b'.')
+
+  def _wait(self):
+    # sleep until the next sample is due, a sample is requested, the mount
+    # table changes, or memory pressure stalls (the interval is re-read after
+    # each interruption)
+    while not self.stopped:
+      timeout = self.started + self.interval - time.time()
+      if timeout <= 0:
+        return
+      for fd, event in self.poller.poll(timeout * 1000):
+        if fd == self.wake_read_fd:
+          os.read(self.wake_read_fd, 512)
+          if self.sample_requested:
+            self.sample_requested = False
+            return
+        elif fd == self.pressure_fd:
+          # sample at once to show the stall (a trigger in error is dropped;
+          # readings continue without it)
+          if event & (select.POLLERR | select.POLLNVAL):
+            self.poller.unregister(fd)
+            self.pressure_sampler.close_trigger()
+            self.pressure_fd = None
+          else:
+            self.pressure_sampler.set_stalled()
+          return
+        else:
+          # polling consumed the change notification - rebuild the index here
+          self.mount_index.refresh()
+          return
+
+  def _deliver(self, sample):
+    # replace any sample still waiting for the main loop (stale samples are
+    # dropped rather than queued) and schedule a single dispatch
+    with self.lock:
+      self.pending = sample
+      if self.idle_id is None:
+        self.idle_id = GLib.idle_add(self._dispatch)
+
+  def _dispatch(self):
+    # (main loop) pass the latest sample to the sample callback
+    with self.lock:
+      sample = self.pending
+      self.pending = None
+      self.idle_id = None
+    if sample is not None:
+      self.sample_callback(sample)
+    return False
@@ -0,0 +1,113 @@
+#
+# NAME
+#
+#   forecast.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's usage forecasting module. Fits a linear trend to
+#   recent readings (a least squares regression over a sliding time window,
+#   updated in constant time per reading) to project when a value will reach
+#   a threshold, e.g. when the active save space will be full.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+from collections import deque
+
+# seconds of readings the trend is fitted to
+FORECAST_WINDOW = 300
+
+# readings, and seconds spanned by them, required before projecting
+FORECAST_MIN_SAMPLES = 5
+FORECAST_MIN_SPAN = 20
+
+class LinearTrend:
+
+  def __init__(self, window=FORECAST_WINDOW, min_samples=FORECAST_MIN_SAMPLES,
+               min_span=FORECAST_MIN_SPAN):
+    self.window = window
+    self.min_samples = min_samples
+    self.min_span = min_span
+    self.reset()
+
+  def reset(self):
+    # forget all readings
+    self.samples = deque() # (timestamp, value)
+    self.origin = None     # time subtracted from timestamps (for precision)
+    self.sum_t = self.sum_y = self.sum_tt = self.sum_ty = 0.0
+
+  def add(self, timestamp, value):
+    # add a reading and drop those older than the window (each reading is
+    # added to and removed from the running sums once)
+    if self.origin is None:
+      self.origin = timestamp
+    value = float(value)
+    self.samples.append((timestamp, value))
+    self._accumulate(timestamp - self.origin, value, 1)
+    while self.samples[0][0] < timestamp - self.window:
+      old_timestamp, old_value = self.samples.popleft()
+      self._accumulate(old_timestamp - self.origin, old_value, -1)
+
+    # move the origin up to the oldest reading once it falls far behind
+    # (keeps the sums small as time passes)
+    offset = self.samples[0][0] - self.origin
+    if offset > self.window:
+      self._shift(offset)
+
+  def slope(self):
+    # fitted change per second (None until enough readings are available)
+    n = len(self.samples)
+    if n < self.min_samples:
+      return None
+    if self.samples[-1][0] - self.samples[0][0] < self.min_span:
+      return None
+    denominator = n * self.sum_tt - self.sum_t * self.sum_t
+    if denominator <= 0:
+      return None
+    return (n * self.sum_ty - self.sum_t * self.sum_y) / denominator
+
+  def time_to_below(self, threshold):
+    # seconds until the latest value falls to threshold at the fitted rate;
+    # 0 if already there, None if unknown or not falling
+    if not self.samples:
+      return None
+    value = self.samples[-1][1]
+    if value <= threshold:
+      return 0.0
+    slope = self.slope()
+    if slope is None or slope >= 0:
+      return None
+    return (threshold - value) / slope
+
+  def _accumulate(self, t, y, sign):
+    self.sum_t += sign * t
+    self.sum_y += sign * y
+    self.sum_tt += sign * t * t
+    self.sum_ty += sign * t * y
+
+  def _shift(self, offset):
+    # re-express the sums relative to origin + offset
+    n = len(self.samples)
+    self.sum_tt += n * offset * offset - 2 * offset * self.sum_t
+    self.sum_ty -= offset * self.sum_y
+    self.sum_t -= n * offset
+    self.origin += offset
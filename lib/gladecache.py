@@ -0,0 +1,43 @@
+#
+# NAME
+#
+#   gladecache.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's glade definition cache. Keeps the contents of glade
+#   files in memory after first use, so windows opened repeatedly (operation,
+#   save, and log view windows) are built without reading from disk.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+# glade file contents by path
+_glade_cache = {}
+
+def add_from_cache(builder, path):
+  # add the glade definition at path to builder (reading the file only once)
+  try:
+    definition = _glade_cache[path]
+  except KeyError:
+    with open(path) as glade_file:
+      definition = _glade_cache[path] = glade_file.read()
+  builder.add_from_string(definition)
@@ -0,0 +1,62 @@
+#
+# NAME
+#
+#   grubdiff.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's grub configuration diff module. Compares the
+#   current grub configuration with a generated (updated) one and formats only
+#   the changed hunks, with context, for display.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+import difflib
+
+# unchanged lines shown around each change
+DIFF_CONTEXT = 3
+
+def diff_grub_config(current_path, updated_path, context=DIFF_CONTEXT):
+  # return (changed, text): whether the configurations differ, and a unified
+  # diff of them (or a message if they do not); a missing current
+  # configuration is compared as empty
+  try:
+    current = _read_lines(current_path)
+  except (IOError, OSError):
+    current = []
+  updated = _read_lines(updated_path)
+
+  lines = list(difflib.unified_diff(current, updated,
+                                    fromfile=current_path,
+                                    tofile='%s (updated)' % current_path,
+                                    n=context))
+  if not lines:
+    return False, 'No changes - the current Grub config is up to date.\n'
+  for i, line in enumerate(lines):
+    if not line.endswith('\n'):
+      lines[i] = line + '\n\\ No newline at end of file\n'
+  return True, ''.join(lines)
+
+
+def _read_lines(path):
+  with open(path, 'rb') as config_file:
+    return config_file.read().decode('utf-8', 'replace').splitlines(True)
@@ -0,0 +1,64 @@
+#
+# NAME
+#
+#   headless.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's headless mode. Takes the same memory and disk usage
+#   readings as the GUI and writes them to stdout as newline-delimited JSON,
+#   once or on an interval, without loading GTK.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+import json, signal, sys, time
+from lib.usage import MemoryUsage, DiskUsage, usage_snapshot
+
+# default seconds between snapshots in watch mode
+WATCH_INTERVAL = 2
+
+def run_headless(watch=False, interval=WATCH_INTERVAL, out=None):
+  # write one snapshot (or one per interval when watching) as a JSON line
+  if out is None:
+    out = sys.stdout
+
+  # exit quietly when the reader goes away (e.g. piped to head)
+  signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+  deadline = time.time()
+  while True:
+    timestamp = time.time()
+    snapshot = usage_snapshot(MemoryUsage(), DiskUsage(), timestamp)
+    out.write(json.dumps(snapshot, sort_keys=True, separators=(',', ':')))
+    out.write('\n')
+    out.flush()
+    if not watch:
+      return 0
+
+    # keep to the interval regardless of how long readings take
+    deadline += interval
+    delay = deadline - time.time()
+    if delay > 0:
+      time.sleep(delay)
+    else:
+      deadline = time.time()
+
@@ -0,0 +1,114 @@
+#
+# NAME
+#
+#   history.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's usage history module. Records recent disk and
+#   memory usage readings in a fixed-size ring buffer of preallocated
+#   numeric columns, so memory use stays constant however long the
+#   application runs.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+import time
+from array import array
+
+# recorded rows [row name, usage object attribute, usage result attribute]
+HISTORY_ROWS = [['ram', 'memory_usage', 'ram'],
+                ['swap', 'memory_usage', 'swap'],
+                ['memory', 'memory_usage', 'total'],
+                ['device', 'disk_usage', 'device'],
+                ['save', 'disk_usage', 'save']]
+
+# number of samples kept (10 minutes at the default 2 second interval)
+HISTORY_SIZE = 300
+
+# marker for unavailable readings (NaN)
+MISSING = float('nan')
+
+class UsageHistory:
+
+  def __init__(self, size=HISTORY_SIZE):
+    self.size = size
+    self.count = 0
+    self.index = 0 # next write position
+
+    # preallocate columns
+    self.timestamps = array('d', [0.0]) * size
+    self.used = {}
+    self.free = {}
+    for row in HISTORY_ROWS:
+      self.used[row[0]] = array('d', [MISSING]) * size
+      self.free[row[0]] = array('d', [MISSING]) * size
+
+  def append(self, memory_usage=None, disk_usage=None, timestamp=None):
+    # record a sample, overwriting the oldest once the buffer is full
+    i = self.index
+    self.timestamps[i] = timestamp if timestamp is not None else time.time()
+    usages = {'memory_usage': memory_usage, 'disk_usage': disk_usage}
+    for row in HISTORY_ROWS:
+      usage = usages[row[1]]
+      if usage is None:
+        self.used[row[0]][i] = self.free[row[0]][i] = MISSING
+      else:
+        usage_result = getattr(usage, row[2])
+        self.used[row[0]][i] = _to_float(usage_result.used)
+        self.free[row[0]][i] = _to_float(usage_result.free)
+    self.index = (i + 1) % self.size
+    if self.count < self.size:
+      self.count += 1
+
+  def positions(self):
+    # buffer positions of recorded samples, oldest first
+    start = (self.index - self.count) % self.size
+    for n in range(self.count):
+      yield (start + n) % self.size
+
+  def latest(self):
+    # buffer position of the newest sample (or None when empty)
+    if not self.count:
+      return None
+    return (self.index - 1) % self.size
+
+  def iter_fractions(self, row):
+    # used fraction (0.0 - 1.0) of each recorded sample, oldest first;
+    # unavailable readings are yielded as NaN
+    used = self.used[row]
+    free = self.free[row]
+    for i in self.positions():
+      total = used[i] + free[i]
+      if total > 0:
+        yield used[i] / total
+      elif total == 0:
+        yield 0.0
+      else:
+        yield MISSING # unavailable reading (NaN total)
+
+
+def _to_float(value):
+  # convert a usage result value to a float (NaN when unavailable)
+  try:
+    return float(value)
+  except (TypeError, ValueError):
+    return MISSING
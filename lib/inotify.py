@@ -0,0 +1,120 @@
+#
+# NAME
+#
+#   inotify.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's minimal inotify module. Wraps the Linux inotify
+#   system calls (through ctypes) to watch directories for changes from the
+#   GLib main loop without polling.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+import ctypes, ctypes.util, errno, os, struct
+
+# event masks (from <sys/inotify.h>)
+IN_MODIFY      = 0x00000002
+IN_ATTRIB      = 0x00000004
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF   = 0x00000800
+IN_IGNORED     = 0x00008000
+IN_ONLYDIR     = 0x01000000
+
+# directory entry changes (entries added, removed, or renamed)
+IN_DIRECTORY_CHANGES = (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO |
+                        IN_DELETE_SELF | IN_MOVE_SELF)
+
+# inotify_init1 flags
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC  = 0o2000000
+
+_EVENT_HEADER = struct.Struct('iIII') # wd, mask, cookie, name length
+
+_libc = None
+
+def _get_libc():
+  # load libc on first use
+  global _libc
+  if _libc is None:
+    _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                        use_errno=True)
+  return _libc
+
+
+class Inotify:
+
+  def __init__(self):
+    # raises OSError when inotify is unavailable
+    self.fd = _get_libc().inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if self.fd < 0:
+      self.fd = None
+      _raise_errno()
+
+  def fileno(self):
+    return self.fd
+
+  def add_watch(self, path, mask=IN_DIRECTORY_CHANGES):
+    # watch path for events in mask; returns the watch descriptor
+    if not isinstance(path, bytes):
+      path = path.encode('utf-8')
+    wd = _get_libc().inotify_add_watch(self.fd, path, mask)
+    if wd < 0:
+      _raise_errno(path)
+    return wd
+
+  def remove_watch(self, wd):
+    _get_libc().inotify_rm_watch(self.fd, wd)
+
+  def read_events(self):
+    # return pending events as (wd, mask, name) tuples without blocking
+    events = []
+    while True:
+      try:
+        data = os.read(self.fd, 65536)
+      except OSError as e:
+        if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+          return events
+        raise
+      offset = 0
+      while offset + _EVENT_HEADER.size <= len(data):
+        wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+        offset += _EVENT_HEADER.size
+        name = data[offset:offset + length].rstrip(b'\0')
+        offset += length
+        events.append((wd, mask, name))
+
+  def close(self):
+    if self.fd is not None:
+      os.close(self.fd)
+      self.fd = None
+
+
+def _raise_errno(path=None):
+  error = ctypes.get_errno()
+  if path is None:
+    raise OSError(error, os.strerror(error))
+  raise OSError(error, os.strerror(error), path)
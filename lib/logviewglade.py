@@ -0,0 +1,94 @@
+#
+# NAME
+#
+#   logviewglade.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's spilled output viewer interface management file.
+#   Loads the log view glade interface, handles associated signals, and pages
+#   through operation output that was trimmed from an operation window.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+from gi.repository import Gtk, Gdk
+from lib.gladecache import add_from_cache
+from lib.paths import PATH_LOGVIEW_GLADE
+
+class LogViewGlade:
+
+  def __init__(self, title, parent_window, spill_log):
+    self.spill_log = spill_log
+
+    # load log view glade window and connect signals
+    builder = self.builder = Gtk.Builder()
+    add_from_cache(builder, PATH_LOGVIEW_GLADE)
+    builder.connect_signals(self)
+
+    # reference window and required child elements
+    window = self.window = builder.get_object('window1')
+    self.textview = builder.get_object('textview_output')
+    self.label_page = builder.get_object('label_page')
+    self.button_previous = builder.get_object('button_previous')
+    self.button_next = builder.get_object('button_next')
+
+    # set window title
+    if title is not None:
+      window.set_title(title)
+
+    # set window as overlay of parent window
+    if parent_window is not None:
+      window.set_transient_for(parent_window)
+
+    # start at the most recent spilled output
+    self.page = spill_log.page_count() - 1
+    self.show_page(self.page)
+
+  ### SIGNALS
+
+  def on_window1_key_press_event(self, widget, event):
+    # close window when escape key is pressed
+    if event.keyval == Gdk.KEY_Escape:
+      self.window.destroy()
+
+  def on_button_close_clicked(self, widget, data=None):
+    self.window.destroy()
+
+  def on_button_previous_clicked(self, widget, data=None):
+    self.show_page(self.page - 1)
+
+  def on_button_next_clicked(self, widget, data=None):
+    self.show_page(self.page + 1)
+
+  ### METHODS
+
+  def show(self):
+    self.window.show()
+
+  def show_page(self, page):
+    # load a single page of spilled output into the textview
+    page_count = self.spill_log.page_count()
+    page = self.page = min(max(page, 0), page_count - 1)
+    self.textview.get_buffer().set_text(self.spill_log.page(page))
+    self.label_page.set_text('Page %d of %d' % (page + 1, page_count))
+    self.button_previous.set_sensitive(page > 0)
+    self.button_next.set_sensitive(page < page_count - 1)
@@ -32,29 +32,90 @@
 #
 
 from __future__ import print_function
+import time
 from gi.repository import Gtk, GObject
 from lib.usage import bytes_to_human
-from lib.operationglade import OperationGlade
-from lib.saveglade import SaveGlade
-from lib.paths import PATH_PLATFORMUTIL_SH, PATH_MAIN_GLADE, PATH_ABOUT_GLADE
+from lib.history import UsageHistory, HISTORY_ROWS
+from lib.render import LabelRenderer
+from lib.forecast import LinearTrend, FORECAST_WINDOW
+from lib.processes import PROCESS_KEYS, PROCESS_TOP
+from lib.progress import format_duration
+from lib.operationqueue import OperationQueue
+from lib.paths import PATH_PLATFORMUTIL_SH, PATH_MAIN_GLADE, PATH_ABOUT_GLADE, \
+  PATH_SAVE_DIR
+
+# python 3 has no separate long type
+try:
+  long
+except NameError:
+  long = int
+
+# operation timeouts, after which an operation is cancelled (in seconds;
+# None for no timeout); saves, save size increases, and grub updates are
+# left running with a warning instead, as interrupting them could leave a
+# partially written save or grub config
+TIMEOUT_SAVE = 4*3600
+TIMEOUT_INCREASE_SAVE_SIZE = 600
+TIMEOUT_DELETE_APT_CACHES = 600
+TIMEOUT_DROP_CACHES = 600
+TIMEOUT_VIEW_GRUB_CONFIG = 60
+TIMEOUT_PREVIEW_GRUB_CONFIG = 300
+TIMEOUT_DIFF_GRUB_CONFIG = 300
+TIMEOUT_UPDATE_GRUB = 300
+
+# start of the line in "Diff Grub Config" generation output that reports the
+# current grub config path (see generategrubconfig in platformutil.sh)
+GRUB_CONFIG_PATH_PREFIX = '- Current configuration: '
+
+# memory free after save below which save size cannot be increased
+MEMORY_FREE_AFTER_SAVE_MINIMUM = pow(1024, 3)
+
+# forecasts beyond this are shown as stable, and those within the warning
+# time are highlighted (in seconds)
+FORECAST_HORIZON = 7*86400
+FORECAST_WARNING = 15*60
+
+# seconds a memory pressure stall warning stays displayed (stalls are often
+# shorter than the sampling interval)
+PRESSURE_WARNING_HOLD = 60
 
 class MainGlade:
 
-  def __init__(self):
-    # load "main" and "about" glades and connect signals
+  def __init__(self, operations_callback=None, processes_callback=None):
+    # load "main" glade and connect signals ("about" glade, and the save and
+    # operation modules, are loaded on first use)
     builder = self.builder = Gtk.Builder()
     builder.add_from_file(PATH_MAIN_GLADE)
-    builder.add_from_file(PATH_ABOUT_GLADE)
     builder.connect_signals(self)
 
     # initialize empty module references
-    self.operation_glade = None
     self.save_glade = None
+    self.about_dialog = None
+    self.operation_pool = None # closed operation windows kept for reuse
+
+    # generated grub configs kept for updating (removed on exit)
+    self.generated_grub_configs = set()
+
+    # keep save names between save dialogs (created with the first dialog;
+    # invalidated on changes)
+    self.save_name_cache = None
+
+    # keep save space usage listings between scans (created with the first
+    # scan; unchanged directories are not listed again)
+    self.scan_cache = None
+
+    # queue operations and track those running (reported to
+    # operations_callback)
+    self.operations_callback = operations_callback
+    self.operations_running = 0
+    self.operation_queue = OperationQueue(
+      running_callback=self._set_operations_running)
 
     # reference window elements
     window = self.window = builder.get_object('window1')
-    about_dialog = self.about_dialog = self.builder.get_object('aboutdialog1')
-    about_dialog.set_transient_for(window)
+
+    # render stat labels only when their content changes
+    self.renderer = LabelRenderer()
 
     # reference stat labels (for updates)
     for i in ['ram', 'swap', 'memory', 'device', 'save']:
@@ -62,10 +123,44 @@ class MainGlade:
         label_name = 'label_%s_%s' % (i, j)
         setattr(self, label_name, builder.get_object(label_name))
 
+    # reference usage history sparklines (for redraws)
+    self.history = UsageHistory()
+    self.sparklines = []
+    for row in HISTORY_ROWS:
+      self.sparklines.append(
+        builder.get_object('drawingarea_%s_history' % row[0]))
+
     # reference "memory free after save" label (for updates)
     self.label_memory_free_after_save = \
       builder.get_object('label_memory_free_after_save')
 
+    # fit trends to save free and memory free after save (for forecasts)
+    self.save_free_trend = LinearTrend()
+    self.memory_free_after_save_trend = LinearTrend()
+    self.label_save_full_forecast = \
+      builder.get_object('label_save_full_forecast')
+    self.label_memory_low_forecast = \
+      builder.get_object('label_memory_low_forecast')
+
+    # reference memory pressure label (for updates) and the time of the last
+    # stall (for warnings)
+    self.label_memory_pressure = builder.get_object('label_memory_pressure')
+    self.pressure_stall_time = None
+    self.pressure_warning = False
+
+    # reference largest processes list (for updates) and its size columns
+    # (for sorting); processes are measured only while the list is shown
+    # (reported to processes_callback)
+    self.processes_callback = processes_callback
+    self.processes_shown = False
+    self.processes = None
+    self.processes_displayed = None
+    self.process_sort = PROCESS_KEYS[0][0]
+    self.liststore_processes = builder.get_object('liststore_processes')
+    self.process_columns = dict(
+      (key[0], builder.get_object('treeviewcolumn_%s' % key[0]))
+      for key in PROCESS_KEYS)
+
     # reference menu items (for enable/disable)
     self.menu_save = \
       builder.get_object('menu_save')
@@ -77,14 +172,19 @@ class MainGlade:
   ### SIGNALS
 
   def on_window1_destroy(self, window, data=None):
+    self._remove_generated_grub_configs()
     Gtk.main_quit()
 
   def on_menu_quit_activate(self, menuitem, data=None):
+    self._remove_generated_grub_configs()
     Gtk.main_quit()
 
   def on_menu_save_activate(self, menuitem, data=None):
     self.run_operation_save()
 
+  def on_menu_save_usage_activate(self, menuitem, data=None):
+    self.show_save_usage()
+
   def on_menu_update_grub_activate(self, menuitem, data=None):
     self.run_operation_update_grub()
 
@@ -103,13 +203,45 @@ class MainGlade:
   def on_menu_preview_updated_grub_config_activate(self, menuitem, data=None):
     self.run_operation_preview_updated_grub_config()
 
+  def on_menu_diff_grub_config_activate(self, menuitem, data=None):
+    self.run_operation_diff_grub_config()
+
   def on_menu_about_activate(self, menuitem, data=None):
-    self.about_dialog.run()
-    self.about_dialog.hide()
+    about_dialog = self._get_about_dialog()
+    about_dialog.run()
+    about_dialog.hide()
+
+  def on_drawingarea_history_draw(self, widget, cr):
+    # draw used fraction history for the widget's row
+    # (widget id format: drawingarea_<row>_history)
+    row = Gtk.Buildable.get_name(widget).split('_')[1]
+    self._draw_sparkline(widget, cr, self.history.iter_fractions(row))
+
+  def on_expander_processes_expanded(self, expander, param):
+    # start (or stop) measuring processes when the list is shown (or hidden)
+    self.processes_shown = expander.get_expanded()
+    if not self.processes_shown:
+      self.processes = self.processes_displayed = None
+      self.liststore_processes.clear()
+    if self.processes_callback is not None:
+      self.processes_callback(self.processes_shown)
+
+  def on_treeviewcolumn_process_clicked(self, column, data=None):
+    # sort the largest processes by the clicked size column
+    self.process_sort = Gtk.Buildable.get_name(column).split('_')[1]
+    for key, process_column in self.process_columns.items():
+      process_column.set_sort_indicator(key == self.process_sort)
+      process_column.set_sort_order(Gtk.SortType.DESCENDING)
+    self._show_processes()
 
   ### METHODS
 
-  def set_usage(self, memory_usage=None, disk_usage=None):
+  def set_usage(self, memory_usage=None, disk_usage=None, timestamp=None,
+                memory_pressure=None, processes=None):
+    # record history and redraw sparklines
+    self.history.append(memory_usage, disk_usage, timestamp)
+    for sparkline in self.sparklines:
+      sparkline.queue_draw()
     # update memory stats
     if memory_usage != None:
       self.set_memory_usage(memory_usage)
@@ -120,6 +252,13 @@ class MainGlade:
     if memory_usage != None and disk_usage != None:
       self.set_memory_free_after_save(memory_usage.total.free,
                                       disk_usage.save.free)
+    # update forecasts
+    self.set_forecasts(memory_usage, disk_usage, timestamp)
+    # update memory pressure
+    self.set_memory_pressure(memory_pressure, timestamp)
+    # update largest processes
+    if processes is not None:
+      self.set_processes(processes)
 
   def set_memory_usage(self, memory_usage):
     self.set_memory_ram(memory_usage.ram)
@@ -193,7 +332,7 @@ class MainGlade:
         memory_free = 0
       tooltip = None
       color = None
-      if memory_free < pow(1024, 3):
+      if memory_free < MEMORY_FREE_AFTER_SAVE_MINIMUM:
         tooltip = 'Save size increase requires 1G. Try dropping memory caches.'
         color = '#aa0000'
       else:
@@ -206,19 +345,100 @@ class MainGlade:
     # enable/disable menus depending on memory availability
     self.menu_increase_save_size.set_sensitive(enable_menu_increase_save_size)
 
+  def set_memory_pressure(self, pressure_reading, timestamp=None):
+    if timestamp is None:
+      timestamp = time.time()
+
+    # hold stall warnings for a while after the last stall
+    if pressure_reading is not None and pressure_reading.stalled:
+      self.pressure_stall_time = timestamp
+    warning = self.pressure_stall_time is not None and \
+      timestamp - self.pressure_stall_time < PRESSURE_WARNING_HOLD
+
+    # update memory pressure label with color and tooltip
+    value, tooltip = _pressure_text(pressure_reading)
+    color = None
+    if warning:
+      value = 'Stalled! %s' % value
+      tooltip = ('Tasks stalled waiting for memory at %s. Try dropping memory '
+                 'caches or closing applications.\n\n%s' %
+                 (time.strftime('%H:%M:%S',
+                                time.localtime(self.pressure_stall_time)),
+                  tooltip))
+      color = '#aa0000'
+    self.renderer.set_label(self.label_memory_pressure, value, color=color,
+                            tooltip=tooltip)
+
+    # draw attention to the window while warning
+    if warning != self.pressure_warning:
+      self.pressure_warning = warning
+      self.window.set_urgency_hint(warning)
+
+  def set_processes(self, processes):
+    # (ignored once the list is hidden)
+    if self.processes_shown:
+      self.processes = processes
+      self._show_processes()
+
+  def set_forecasts(self, memory_usage, disk_usage, timestamp=None):
+    if timestamp is None:
+      timestamp = time.time()
+
+    # fit readings (a trend restarts whenever its reading is unavailable)
+    save_free = None
+    memory_free = None
+    if disk_usage != None:
+      save_free = _to_long(disk_usage.save.free)
+    if memory_usage != None and save_free is not None:
+      total_free = _to_long(memory_usage.total.free)
+      if total_free is not None:
+        # memory free after save (needs both readings)
+        memory_free = max(0, total_free - save_free)
+    for trend, value in [[self.save_free_trend, save_free],
+                         [self.memory_free_after_save_trend, memory_free]]:
+      if value is None:
+        trend.reset()
+      else:
+        trend.add(timestamp, value)
+
+    # update forecast labels
+    self._set_label_forecast(self.label_save_full_forecast,
+                             self.save_free_trend, 0)
+    self._set_label_forecast(self.label_memory_low_forecast,
+                             self.memory_free_after_save_trend,
+                             MEMORY_FREE_AFTER_SAVE_MINIMUM)
+
   def run_operation_save(self):
+    from lib.saveglade import SaveGlade
+    from lib.savenames import SaveNameCache
+    if self.save_name_cache is None:
+      self.save_name_cache = SaveNameCache()
+
     # initialize save name selection dialog with callback
     save_glade = self.save_glade = \
       SaveGlade('Save to Disk', self.window,
-                ok_callback=self._save_ok_callback)
+                ok_callback=self._save_ok_callback,
+                save_name_cache=self.save_name_cache)
     save_glade.show()
 
   def _save_ok_callback(self, save_name):
+    from lib.progress import SaveProgress
+
     # perform save to disk action
     self.save_glade = None
     self._run_operation('Save to Disk (save name: %s)' % save_name,
                         [PATH_PLATFORMUTIL_SH, 'save', save_name],
-                        expanded=True)
+                        expanded=True, progress=SaveProgress(),
+                        exclusive=True, timeout=TIMEOUT_SAVE,
+                        cancel_on_timeout=False)
+
+  def show_save_usage(self):
+    from lib.scanglade import ScanGlade
+    from lib.savescan import ScanCache
+    if self.scan_cache is None:
+      self.scan_cache = ScanCache()
+    scan_glade = ScanGlade(self.window, PATH_SAVE_DIR, self.scan_cache)
+    scan_glade.show()
 
   def run_operation_increase_save_size(self):
     # initialize warning dialog
@@ -246,7 +466,9 @@ class MainGlade:
     if response == Gtk.ResponseType.OK:
       # perform increase save size action
       self._run_operation('Increase Save Size',
-                          [PATH_PLATFORMUTIL_SH, 'increasesavesize'])
+                          [PATH_PLATFORMUTIL_SH, 'increasesavesize'],
+                          exclusive=True, timeout=TIMEOUT_INCREASE_SAVE_SIZE,
+                          cancel_on_timeout=False)
 
     dialog.destroy()
 
@@ -266,7 +488,8 @@ class MainGlade:
 
     if response == Gtk.ResponseType.OK:
       # perform delete apt caches action
-      self._run_operation('Delete Apt Caches', ['apt-get', 'clean'])
+      self._run_operation('Delete Apt Caches', ['apt-get', 'clean'],
+                          exclusive=False, timeout=TIMEOUT_DELETE_APT_CACHES)
 
     dialog.destroy()
 
@@ -296,7 +519,8 @@ class MainGlade:
       # perform drop memory caches action
       self._run_operation('Drop Memory Caches',
                           'sync; echo 3 >/proc/sys/vm/drop_caches',
-                          shell=True)
+                          shell=True, exclusive=True,
+                          timeout=TIMEOUT_DROP_CACHES)
 
     dialog.destroy()
 
@@ -305,16 +529,72 @@ class MainGlade:
     self._run_operation('View Current Grub Config',
                         [PATH_PLATFORMUTIL_SH, 'viewgrubconfig'],
                         expanded=True,
-                        autoscroll=False)
+                        autoscroll=False,
+                        exclusive=False,
+                        timeout=TIMEOUT_VIEW_GRUB_CONFIG)
 
   def run_operation_preview_updated_grub_config(self):
     # display preview of updated grub config
     self._run_operation('Preview Updated Grub Config',
                         [PATH_PLATFORMUTIL_SH, 'previewgrubconfig'],
                         expanded=True,
-                        autoscroll=False)
+                        autoscroll=False,
+                        exclusive=False,
+                        timeout=TIMEOUT_PREVIEW_GRUB_CONFIG)
+
+  def run_operation_diff_grub_config(self):
+    # generate an updated grub config once and display its differences from
+    # the current config (the generated config is kept for updating)
+    import os, tempfile
+    fd, generated_path = tempfile.mkstemp(prefix='wren-gui-grub.',
+                                          suffix='.cfg')
+    os.close(fd)
+    self.generated_grub_configs.add(generated_path)
+    self._run_operation('Diff Grub Config',
+                        [PATH_PLATFORMUTIL_SH, 'generategrubconfig',
+                         generated_path],
+                        expanded=True,
+                        autoscroll=False,
+                        exclusive=False,
+                        timeout=TIMEOUT_DIFF_GRUB_CONFIG,
+                        result_callback=lambda operation_glade, returncode:
+                          self._diff_grub_config_result(operation_glade,
+                                                        returncode,
+                                                        generated_path))
+
+  def _diff_grub_config_result(self, operation_glade, returncode,
+                               generated_path):
+    from lib.grubdiff import diff_grub_config
+
+    # keep generation output on failure
+    if returncode != 0:
+      self._remove_generated_grub_config(generated_path)
+      return
+
+    # replace generation output with the differences from the current config
+    # (whose path generation reports, so none is queried from the main loop)
+    try:
+      current_path = _reported_value(operation_glade.get_output(),
+                                     GRUB_CONFIG_PATH_PREFIX)
+      if current_path is None:
+        raise IOError('Current Grub config path not reported')
+      changed, text = diff_grub_config(current_path, generated_path)
+    except (IOError, OSError) as e:
+      operation_glade.output_callback('\nUnable to compare Grub configs: %s\n'
+                                      % e)
+      operation_glade.flush_output()
+      self._remove_generated_grub_config(generated_path)
+      return
+    operation_glade.set_output(text)
+
+    # offer to apply the generated config (without generating it again)
+    if changed:
+      operation_glade.set_action('Update Grub Config...',
+        lambda operation_glade: self.run_operation_update_grub(generated_path))
+    else:
+      self._remove_generated_grub_config(generated_path)
 
-  def run_operation_update_grub(self):
+  def run_operation_update_grub(self, generated_path=None):
     # initialize warning dialog
     dialog = Gtk.MessageDialog(self.window,
                                Gtk.DialogFlags.DESTROY_WITH_PARENT,
@@ -339,22 +619,41 @@ class MainGlade:
                                  'from "Preview Updated Grub Config" and '
                                  'perform the updates manually.')
     response = dialog.run()
+    dialog.destroy()
 
     if response == Gtk.ResponseType.OK:
-      # perform grub configuration update
-      self._run_operation('Updated Grub Config',
-                          [PATH_PLATFORMUTIL_SH, 'updategrub'])
-
-    dialog.destroy()
+      # perform grub configuration update (with a config generated by "Diff
+      # Grub Config", if provided)
+      command = [PATH_PLATFORMUTIL_SH, 'updategrub']
+      result_callback = None
+      if generated_path is not None:
+        command.append(generated_path)
+        result_callback = lambda operation_glade, returncode: \
+          self._remove_generated_grub_config(generated_path)
+      self._run_operation('Updated Grub Config', command,
+                          exclusive=True, timeout=TIMEOUT_UPDATE_GRUB,
+                          cancel_on_timeout=False,
+                          result_callback=result_callback)
+      return True
+    return False
 
   def _run_operation(self, title, command, expanded=False, autoscroll=True,
-                     shell=False):
-
-    # initialize subprocess operation window with defined options
-    operation_glade = self.operation_glade = \
-      OperationGlade(title, self.window,
-                     close_callback=self._operation_close_callback,
-                     autoscroll=autoscroll)
+                     shell=False, progress=None, exclusive=True,
+                     timeout=None, cancel_on_timeout=True,
+                     result_callback=None):
+    # exclusive operations (saving, resizing, grub updates, dropping caches)
+    # run alone; others may run alongside each other; operations that must
+    # not be interrupted (cancel_on_timeout False) only warn on timeout
+    from lib.operationglade import OperationGladePool
+    if self.operation_pool is None:
+      self.operation_pool = OperationGladePool()
+
+    # initialize (or reuse) subprocess operation window with defined options
+    operation_glade = self.operation_pool.acquire(
+      title, self.window,
+      complete_callback=self._operation_complete_callback,
+      autoscroll=autoscroll, progress=progress,
+      result_callback=result_callback)
 
     # expand terminal output display if requested
     if expanded is True:
@@ -362,12 +661,116 @@ class MainGlade:
 
     operation_glade.show()
 
-    # wait for window to show and then run command
+    # wait for window to show and then queue command
+    resets = operation_glade.resets
     GObject.timeout_add_seconds(0.5,
-      lambda: operation_glade.run_command(command, shell=shell))
+      lambda: self._operation_submit(operation_glade, resets, command, shell,
+                                     exclusive, timeout, cancel_on_timeout))
+
+  def _operation_submit(self, operation_glade, resets, command, shell,
+                        exclusive, timeout, cancel_on_timeout):
+    # (skip operations cancelled before they were queued, whose window may
+    # already have been reused)
+    if operation_glade.resets == resets and not operation_glade.cancelled:
+      self.operation_queue.submit(operation_glade, command, shell=shell,
+                                  exclusive=exclusive, timeout=timeout,
+                                  cancel_on_timeout=cancel_on_timeout)
+    return False
+
+  def _operation_complete_callback(self, operation_glade):
+    self.operation_queue.finished(operation_glade)
+
+  def _set_operations_running(self, count):
+    self.operations_running = count
+    if self.operations_callback is not None:
+      self.operations_callback(count)
+
+  def _remove_generated_grub_config(self, generated_path):
+    import os
+    self.generated_grub_configs.discard(generated_path)
+    try:
+      os.remove(generated_path)
+    except OSError:
+      pass
 
-  def _operation_close_callback(self):
-    self.operation_glade = None
+  def _remove_generated_grub_configs(self):
+    for generated_path in list(self.generated_grub_configs):
+      self._remove_generated_grub_config(generated_path)
+
+  def _get_about_dialog(self):
+    # load "about" glade on first use
+    if self.about_dialog is None:
+      builder = Gtk.Builder()
+      builder.add_from_file(PATH_ABOUT_GLADE)
+      self.about_dialog = builder.get_object('aboutdialog1')
+      self.about_dialog.set_transient_for(self.window)
+    return self.about_dialog
+
+  def _draw_sparkline(self, widget, cr, fractions):
+    width = widget.get_allocated_width()
+    height = widget.get_allocated_height()
+
+    # use the label text color
+    color = widget.get_style_context().get_color(Gtk.StateFlags.NORMAL)
+    cr.set_source_rgba(color.red, color.green, color.blue, 0.8)
+    cr.set_line_width(1)
+
+    # newest sample at the right edge; a full history spans the width
+    step = float(width - 1) / max(self.history.size - 1, 1)
+    x = (width - 1) - (self.history.count - 1) * step
+    drawing = False
+    for fraction in fractions:
+      if fraction != fraction:
+        # unavailable reading (NaN) - leave a gap
+        drawing = False
+      else:
+        y = (height - 1) - min(max(fraction, 0.0), 1.0) * (height - 2) + 0.5
+        if drawing:
+          cr.line_to(x, y)
+        else:
+          cr.move_to(x, y)
+          drawing = True
+      x += step
+    cr.stroke()
+
+  def _set_label_forecast(self, label, trend, threshold):
+    # show time until trend falls to threshold ("---" until known, "Stable"
+    # if not falling, or not within the forecast horizon)
+    tooltip = 'Projected from the last %d minutes of readings' % \
+      (FORECAST_WINDOW // 60)
+    color = None
+    if not trend.samples:
+      value = '---'
+    else:
+      seconds = trend.time_to_below(threshold)
+      if seconds is None and trend.slope() is None:
+        value = '---'
+        tooltip = 'Not enough readings yet to project a trend'
+      elif seconds is None or seconds > FORECAST_HORIZON:
+        value = 'Stable'
+      elif seconds == 0:
+        value = 'Now'
+        color = '#aa0000'
+      else:
+        value = 'about %s' % format_duration(seconds)
+        if seconds < FORECAST_WARNING:
+          color = '#aa0000'
+    self.renderer.set_label(label, value, color=color, tooltip=tooltip)
+
+  def _show_processes(self):
+    # list the largest processes by the sort measure (if changed)
+    if self.processes is None:
+      return
+    measure = dict(PROCESS_KEYS)[self.process_sort]
+    rows = [[p.pid, p.name] + [_bytes_text(v) for v in [p.pss, p.rss, p.swap]]
+            for p in sorted(self.processes, key=measure, reverse=True)
+            if measure(p)][:PROCESS_TOP]
+    if rows == self.processes_displayed:
+      return
+    self.processes_displayed = rows
+    self.liststore_processes.clear()
+    for row in rows:
+      self.liststore_processes.append(row)
 
   def _set_label_bytes(self, label, byte_count, tooltip=None, color=None):
     # convert bytes to human-readable format
@@ -384,14 +787,62 @@ class MainGlade:
     if value == None:
       value = '---'
 
-    # set text with (optional) requested color
-    if color == None:
-      label.set_text(value)
-    else:
-      label.set_markup('<span foreground="%s">%s</span>' %(color, value))
-
-    # set tooltip
-    if tooltip_value == None:
-      label.set_has_tooltip(False)
-    else:
-      label.set_tooltip_text(tooltip_value)
+    # set text (with optional color) and tooltip if changed
+    self.renderer.set_label(label, value, color=color, tooltip=tooltip_value)
+
+
+def _to_long(value):
+  # reading as a number (None if unavailable)
+  try:
+    return long(value)
+  except (TypeError, ValueError):
+    return None
+
+
+def _pressure_text(pressure_reading):
+  # memory pressure (value, tooltip) for display
+  if pressure_reading is None:
+    return '---', 'Memory pressure is unavailable'
+
+  # pressure stall information: share of time tasks waited for memory
+  if pressure_reading.source == 'psi':
+    some = [pressure_reading.some_avg10, pressure_reading.some_avg60,
+            pressure_reading.some_avg300]
+    full = [pressure_reading.full_avg10, pressure_reading.full_avg60,
+            pressure_reading.full_avg300]
+    value = 'some %.1f%%' % some[0]
+    tooltip = ('Share of time tasks waited for memory (10s / 60s / 300s '
+               'averages)\nSome tasks: %s' %
+               ' / '.join('%.2f%%' % v for v in some))
+    if full[0] is not None:
+      value += ', full %.1f%%' % full[0]
+      tooltip += '\nAll tasks: %s' % ' / '.join('%.2f%%' % v for v in full)
+    return value, tooltip
+
+  # vmstat fallback: page reclaim since the previous reading
+  if pressure_reading.reclaimed_rate is None:
+    return '---', 'Measuring page reclaim...'
+  reclaimed = bytes_to_human(long(pressure_reading.reclaimed_rate))
+  value = 'reclaiming %s/s' % reclaimed
+  tooltip = ('Pressure stall information is unavailable. Page reclaim since '
+             'the previous reading:\nScanned: %s/s\nReclaimed: %s/s' %
+             (bytes_to_human(long(pressure_reading.scanned_rate or 0)),
+              reclaimed))
+  if pressure_reading.oom_kills is not None:
+    tooltip += '\nOut of memory kills: %d' % pressure_reading.oom_kills
+  return value, tooltip
+
+
+def _bytes_text(byte_count):
+  # byte count for display ("---" if not measured)
+  if byte_count is None:
+    return '---'
+  return bytes_to_human(byte_count)
+
+
+def _reported_value(output, prefix):
+  # value of the last output line starting with prefix (None if not found)
+  for line in reversed(output.splitlines()):
+    if line.startswith(prefix):
+      return line[len(prefix):]
+  return None
@@ -0,0 +1,164 @@
+#
+# NAME
+#
+#   metrics.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's metrics exporter. Publishes collected usage samples
+#   in the Prometheus text format, as an atomically replaced node exporter
+#   textfile and/or over HTTP on localhost. Takes no readings of its own.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+import os, tempfile, threading
+try:
+  from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+  from http.server import BaseHTTPRequestHandler, HTTPServer
+from lib.usage import usage_snapshot
+
+# address the HTTP endpoint listens on (local scrapes only)
+METRICS_HTTP_ADDRESS = '127.0.0.1'
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# exported gauges [name, help, labels, snapshot path]
+METRICS = [
+  ['wren_memory_bytes', 'Memory usage in bytes (as reported by free -bt).',
+   [[{'memory': m, 'state': s}, ['memory', m, s]]
+    for m in ['ram', 'swap', 'total'] for s in ['total', 'used', 'free']]],
+  ['wren_disk_bytes', 'Wren device and active save usage in bytes.',
+   [[{'disk': d, 'state': s}, ['disk', d, s]]
+    for d in ['device', 'save'] for s in ['total', 'used', 'free']]],
+  ['wren_memory_free_after_save_bytes',
+   'Memory free in bytes if the active save were filled.',
+   [[{}, ['memory_free_after_save']]]],
+  ['wren_sample_timestamp_seconds',
+   'Time the usage sample was taken (seconds since the epoch).',
+   [[{}, ['timestamp']]]]
+]
+
+
+class MetricsExporter:
+
+  def __init__(self, textfile_path=None, http_port=None,
+               http_address=METRICS_HTTP_ADDRESS):
+    self.textfile_path = textfile_path
+    self.http_port = http_port
+    self.http_address = http_address
+    self.server = None
+
+    # latest formatted metrics (served by the HTTP thread)
+    self.lock = threading.Lock()
+    self.text = format_metrics(None)
+
+  def start(self):
+    # start serving HTTP (if enabled) on a background thread
+    if self.http_port is None:
+      return
+    server = self.server = HTTPServer((self.http_address, self.http_port),
+                                      _MetricsRequestHandler)
+    server.exporter = self
+    thread = threading.Thread(target=server.serve_forever,
+                              name='metrics-http')
+    thread.daemon = True
+    thread.start()
+
+  def stop(self):
+    if self.server is not None:
+      self.server.shutdown()
+      self.server.server_close()
+      self.server = None
+
+  def update(self, sample):
+    # (collector thread) publish a usage sample
+    text = format_metrics(sample)
+    with self.lock:
+      self.text = text
+    if self.textfile_path is not None:
+      _write_atomic(self.textfile_path, text)
+
+  def get_text(self):
+    with self.lock:
+      return self.text
+
+
+def format_metrics(sample):
+  # usage sample as Prometheus text (unavailable readings are left out)
+  snapshot = {}
+  if sample is not None:
+    snapshot = usage_snapshot(sample.memory_usage, sample.disk_usage,
+                              sample.timestamp)
+  lines = []
+  for name, help_text, series in METRICS:
+    lines.append('# HELP %s %s' % (name, help_text))
+    lines.append('# TYPE %s gauge' % name)
+    for labels, path in series:
+      value = snapshot
+      for key in path:
+        value = value.get(key) if value is not None else None
+      if value is None:
+        continue
+      label_text = ','.join('%s="%s"' % (key, labels[key])
+                            for key in sorted(labels))
+      if label_text:
+        label_text = '{%s}' % label_text
+      lines.append('%s%s %s' % (name, label_text, repr(float(value))))
+  return '\n'.join(lines) + '\n'
+
+
+def _write_atomic(path, text):
+  # write text to a temporary file beside path, then rename it over path
+  # (readers see either the old or the new file, never a partial one)
+  directory = os.path.dirname(os.path.abspath(path))
+  fd, temp_path = tempfile.mkstemp(prefix='.%s.' % os.path.basename(path),
+                                   dir=directory)
+  try:
+    os.fchmod(fd, 0o644)
+    os.write(fd, text.encode('utf-8'))
+    os.close(fd)
+    fd = None
+    os.rename(temp_path, path)
+  except (IOError, OSError):
+    if fd is not None:
+      os.close(fd)
+    os.unlink(temp_path)
+    raise
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+
+  def do_GET(self):
+    if self.path.split('?')[0] not in ('/', '/metrics'):
+      self.send_error(404)
+      return
+    body = self.server.exporter.get_text().encode('utf-8')
+    self.send_response(200)
+    self.send_header('Content-Type', CONTENT_TYPE)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, format, *args):
+    # keep scrapes out of the terminal
+    pass
@@ -31,8 +31,19 @@
 # more details.
 #
 
+import errno, fcntl, os, signal
 from subprocess import PIPE, STDOUT, Popen
-from gi.repository.GObject import IO_IN, IO_HUP, io_add_watch, source_remove
+from gi.repository.GObject import IO_IN, IO_HUP, io_add_watch, source_remove, \
+  timeout_add_seconds
+
+# bytes requested per read, and at most read per IO wakeup (so a flood of
+# output cannot starve the main loop)
+READ_SIZE = 65536
+READ_LIMIT = 1048576
+
+# seconds between asking a cancelled operation to terminate (SIGTERM) and
+# killing it (SIGKILL), and between killing it and giving up on its output
+KILL_GRACE_TIME = 5
 
 class Operation:
 
@@ -40,63 +51,123 @@ class Operation:
     self.done_callback = done_callback
     self.output_callback = output_callback
     self.process = None
-    self.io_in_id = None
-    self.io_hup_id = None
+    self.io_id = None
+    self.timeout_id = None
+    self.kill_id = None
+    self.overdue_callback = None
+    self.cancelled = False
+    self.timed_out = False
 
-  def run(self, command, shell=False):
-    # disable IO watchers (in case of already running operation)
+  def run(self, command, shell=False, timeout=None, overdue_callback=None):
+    # disable IO watcher (in case of already running operation)
     self._stop_listening()
+    self.overdue_callback = overdue_callback
+    self.cancelled = False
+    self.timed_out = False
 
-    # open subprocess
+    # open subprocess in its own process group (so it can be signalled with
+    # all of its children)
     process = self.process = Popen(command, stdout=PIPE, stderr=STDOUT,
-                                   shell=shell)
+                                   shell=shell, preexec_fn=os.setpgrp)
+
+    # read output from the raw (non-blocking) descriptor
+    fd = process.stdout.fileno()
+    fcntl.fcntl(fd, fcntl.F_SETFL,
+                fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+    # initialize IO watcher
+    self.io_id = io_add_watch(fd, IO_IN | IO_HUP, self._handle_io)
+
+    # cancel the operation if it runs longer than timeout seconds (or call
+    # overdue_callback instead, for operations unsafe to interrupt)
+    if timeout is not None:
+      self.timeout_id = timeout_add_seconds(timeout, self._timeout_callback)
+
+  def cancel(self):
+    # terminate the process group, killing it if it has not ended after
+    # KILL_GRACE_TIME seconds
+    if self.io_id is None or self.cancelled:
+      return
+    self.cancelled = True
+    self._signal(signal.SIGTERM)
+    self.kill_id = timeout_add_seconds(KILL_GRACE_TIME, self._kill_callback)
+
+  def _timeout_callback(self):
+    self.timeout_id = None
+    if self.overdue_callback is not None:
+      if not self.cancelled:
+        self.overdue_callback()
+      return False
+    self.timed_out = True
+    self.cancel()
+    return False
 
-    # initialize IO watchers
-    self.io_in_id = io_add_watch(process.stdout, IO_IN, self._handle_io)
-    self.io_hup_id = io_add_watch(process.stdout, IO_HUP, self._handle_io)
+  def _kill_callback(self):
+    # kill the process group; if output is still held open afterwards (by a
+    # process that left the group) finish without it
+    self._signal(signal.SIGKILL)
+    self.kill_id = timeout_add_seconds(KILL_GRACE_TIME, self._abandon_callback)
+    return False
+
+  def _abandon_callback(self):
+    self.kill_id = None
+    self._stop_listening()
+    self._finish()
+    return False
+
+  def _signal(self, sig):
+    try:
+      os.killpg(self.process.pid, sig)
+    except OSError as e:
+      # process group already gone
+      if e.errno != errno.ESRCH:
+        raise
 
   def _handle_io(self, fd, condition):
-    if condition == IO_IN:
-      # handle subprocess output
-      self._read_to_output(fd)
+    # handle subprocess output (remaining output is read before hang up)
+    if self._read_to_output(fd):
       return True
-    else:
-      if condition == IO_HUP:
-        # handle hang up (pipe closed)
-        # wait for return code
-        self.process.wait()
-        # disable IO watchers
-        self._stop_listening()
-        # handle any remaining subprocess output
-        self._read_all_to_output(fd)
-        # trigger done callback
-        if self.done_callback is not None:
-          self.done_callback(self.process.returncode)
-      # unregister IO watcher (otherwise CPU will spike to near 100%)
-      return False
 
-  def _read_to_output(self, fd):
-    # if an output callback was defined,
-    # pass it a block of available subprocess output
-    if self.output_callback is not None:
-      data = fd.read(1024)
-      if data:
-        self.output_callback(data)
+    # handle end of output (pipe closed)
+    # disable IO watcher
+    self.io_id = None
+    self._finish()
+    # unregister IO watcher (otherwise CPU will spike to near 100%)
+    return False
 
-  def _read_all_to_output(self, fd):
-    # if an output callback was defined,
-    # pass it all available subprocess output
-    if self.output_callback is not None:
-      data = fd.read(1024)
-      while data:
+  def _finish(self):
+    # stop timers
+    for source_id in (self.timeout_id, self.kill_id):
+      if source_id is not None:
+        source_remove(source_id)
+    self.timeout_id = self.kill_id = None
+    # wait for return code
+    self.process.wait()
+    self.process.stdout.close()
+    # trigger done callback
+    if self.done_callback is not None:
+      self.done_callback(self.process.returncode)
+
+  def _read_to_output(self, fd):
+    # pass available subprocess output (up to READ_LIMIT bytes) to the
+    # output callback, if defined; returns False once output has ended
+    total = 0
+    while total < READ_LIMIT:
+      try:
+        data = os.read(fd, READ_SIZE)
+      except OSError as e:
+        if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+          return True
+        raise
+      if not data:
+        return False
+      total += len(data)
+      if self.output_callback is not None:
         self.output_callback(data)
-        data = fd.read(1024)
+    return True
 
   def _stop_listening(self):
-    # disable IO watchers
-    if self.io_in_id is not None:
-      source_remove(self.io_in_id)
-      self.io_in_id = None
-    if self.io_hup_id is not None:
-      source_remove(self.io_hup_id)
-      self.io_hup_id = None
+    # disable IO watcher
+    if self.io_id is not None:
+      source_remove(self.io_id)
+      self.io_id = None
@@ -31,42 +31,124 @@
 # more details.
 #
 
-import traceback
-from gi.repository import Gtk, Gdk
+import codecs, traceback
+from gi.repository import Gtk, Gdk, GObject
 from lib.operation import Operation
+from lib.scrollback import SpillLog
+from lib.usage import bytes_to_human
+from lib.progress import format_duration
+from lib.gladecache import add_from_cache
 from lib.paths import PATH_OPERATION_GLADE
 
-class OperationGlade:
+# default output kept in the textview (older output is spilled to disk);
+# whichever limit is reached first applies (None for no limit)
+SCROLLBACK_LINES = 5000
+SCROLLBACK_CHARS = 1048576
 
-  def __init__(self, title, parent_window, close_callback=None,
-               autoscroll=True, shell=False):
-    self.title = title
-    self.parent_window = parent_window
-    self.autoscroll = autoscroll
-    self.shell=shell
+# queued output (in characters) flushed without waiting for the next frame
+# while the window is hidden or minimized (and draws no frames)
+PENDING_OUTPUT_CHARS = 1048576
 
-    self.done = False
+# progress bar update interval (in seconds)
+PROGRESS_INTERVAL = 1
+
+# closed operation windows kept (hidden) for reuse
+POOL_SIZE = 2
 
+class OperationGlade:
+
+  def __init__(self, title, parent_window, close_callback=None,
+               complete_callback=None, autoscroll=True, shell=False,
+               scrollback_lines=SCROLLBACK_LINES,
+               scrollback_chars=SCROLLBACK_CHARS, progress=None,
+               result_callback=None):
     # load operation glade window and connect signals
     builder = self.builder = Gtk.Builder()
-    builder.add_from_file(PATH_OPERATION_GLADE)
+    add_from_cache(builder, PATH_OPERATION_GLADE)
     builder.connect_signals(self)
 
     # reference window and required child elements
-    window = self.window = builder.get_object('window1')
+    self.window = builder.get_object('window1')
     self.label_status = builder.get_object('label_status')
+    self.progressbar = builder.get_object('progressbar1')
     self.expander = builder.get_object('expander1')
     self.textview = builder.get_object('textview_output')
     self.scrolledwindow = builder.get_object('scrolledwindow_output')
     self.button_close = builder.get_object('button_close')
+    self.button_cancel = builder.get_object('button_cancel')
+    self.button_action = builder.get_object('button_action')
+    self.button_earlier_output = builder.get_object('button_earlier_output')
+
+    # keep a mark at the end of output (for autoscrolling)
+    buf = self.textview.get_buffer()
+    self.end_mark = buf.create_mark('end', buf.get_end_iter(), False)
+
+    self.spill_log = None
+    self.log_view_glade = None
+    self.progress_id = None
+    self.flush_id = None
+    self.resets = -1 # times reset for reuse
+    self.reset(title, parent_window, close_callback=close_callback,
+               complete_callback=complete_callback, autoscroll=autoscroll,
+               shell=shell, scrollback_lines=scrollback_lines,
+               scrollback_chars=scrollback_chars, progress=progress,
+               result_callback=result_callback)
+
+  def reset(self, title, parent_window, close_callback=None,
+            complete_callback=None, autoscroll=True, shell=False,
+            scrollback_lines=SCROLLBACK_LINES,
+            scrollback_chars=SCROLLBACK_CHARS, progress=None,
+            result_callback=None):
+    # prepare the window for a new operation (initially, or when reused);
+    # close_callback(operation_glade) returns True to keep the closed window
+    # (hidden) for reuse instead of destroying it, and
+    # result_callback(operation_glade, returncode) is called when the command
+    # ends (e.g. to process its output)
+    self.resets += 1
+    self.title = title
+    self.parent_window = parent_window
+    self.close_callback = close_callback
+    self.complete_callback = complete_callback
+    self.result_callback = result_callback
+    self.action_callback = None
+    self.autoscroll = autoscroll
+    self.shell=shell
+
+    self.done = False
+    self.cancelled = False
+    self.operation = None
+
+    # output waiting for the next frame (and its length), and its tick
+    # callback
+    self.pending_output = []
+    self.pending_chars = 0
+    self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+
+    # scrollback limits and log of output trimmed from the textview
+    self.scrollback_lines = scrollback_lines
+    self.scrollback_chars = scrollback_chars
+    self._release()
+
+    # optional progress estimator (e.g. SaveProgress) and its update timer
+    self.progress = progress
+
+    # clear previous operation display
+    self.textview.get_buffer().set_text('')
+    self.label_status.set_markup('Waiting...')
+    self.progressbar.set_fraction(0.0)
+    self.progressbar.hide()
+    self.button_earlier_output.hide()
+    self.button_cancel.set_sensitive(True)
+    self.button_cancel.show()
+    self.button_action.hide()
+    self.collapse()
 
     # set window title
     if title is not None:
-      window.set_title(title)
+      self.window.set_title(title)
 
     # set window as overlay of parent window
-    if parent_window is not None:
-      window.set_transient_for(parent_window)
+    self.window.set_transient_for(parent_window)
 
     # Disable button_close
     self._disable_close()
@@ -75,21 +157,44 @@ class OperationGlade:
 
   def on_window1_delete_event(self, widget, data=None):
     # Disable window close button until button_close is enabled
-    return not self.done
+    if self.done:
+      self.close()
+    return True
+
+  def on_window1_destroy(self, widget, data=None):
+    # remove spilled output and stop progress updates
+    self._release()
 
   def on_window1_key_press_event(self, widget, event):
     # close window when escape key is pressed (if operation is done)
     if event.keyval == Gdk.KEY_Escape and self.done:
-      self.window.destroy()
+      self.close()
 
   def on_button_close_clicked(self, widget, data=None):
     # close window when button_close clicked if operation is done
     if self.done:
-      self.window.destroy()
-
-  def on_textview_output_size_allocate(self, widget, data=None):
-    # Scroll to bottom on textview expansion
-    self.scroll()
+      self.close()
+
+  def on_button_cancel_clicked(self, widget, data=None):
+    self.cancel()
+
+  def on_button_action_clicked(self, widget, data=None):
+    # run the follow-up action (once it reports being taken)
+    if self.action_callback is not None and self.action_callback(self):
+      self.action_callback = None
+      self.button_action.hide()
+
+  def on_button_earlier_output_clicked(self, widget, data=None):
+    # browse output trimmed from the textview
+    if self.spill_log is not None:
+      from lib.logviewglade import LogViewGlade
+      title = 'Earlier Output'
+      if self.title is not None:
+        title = '%s - %s' % (self.title, title)
+      if self.log_view_glade is not None:
+        self.log_view_glade.window.destroy()
+      self.log_view_glade = LogViewGlade(title, self.window, self.spill_log)
+      self.log_view_glade.show()
 
   def on_expander1_activate(self, widget, data=None):
     # Scroll to bottom when textview is expanded
@@ -100,6 +205,14 @@ class OperationGlade:
   def show(self):
     self.window.show()
 
+  def close(self):
+    # hide the window for reuse if close_callback keeps it, else destroy it
+    if self.close_callback is not None and self.close_callback(self):
+      self.window.hide()
+      self._release()
+    else:
+      self.window.destroy()
+
   def expand(self, expanded=True):
     self.expander.set_expanded(expanded)
 
@@ -112,38 +225,107 @@ class OperationGlade:
       adj = self.scrolledwindow.get_vadjustment()
       adj.set_value(adj.get_upper() - adj.get_page_size())
 
-  def run_command(self, command, shell=False):
+  def run_command(self, command, shell=False, timeout=None,
+                  cancel_on_timeout=True):
+    # cancel the command after timeout seconds, or (if cancel_on_timeout is
+    # False) warn that it is overdue and leave cancelling it to the user
     self.done = False
+    self.timeout = timeout
 
     # disable closing the window until operation completes
     self._disable_close()
     
     # initialize subprocess operation
-    operation = Operation(done_callback=self.done_callback,
-                          output_callback=self.output_callback)
+    operation = self.operation = Operation(done_callback=self.done_callback,
+                                           output_callback=self.output_callback)
 
     # run subprocess operation
     try:
-      operation.run(command, shell=shell)
+      operation.run(command, shell=shell, timeout=timeout,
+                    overdue_callback=None if cancel_on_timeout else
+                      self._overdue_callback)
       self._set_message_working()
+      self._start_progress()
     except:
       # on (python-level) failure, display error and allow window to be closed
       self.done = True
       self._enable_close()
+      self.button_cancel.hide()
       self._set_message_error()
       strerror = traceback.format_exc()
       print(strerror)
       self.output_callback(strerror)
+      self.flush_output()
       self.expand()
       self.scroll(force=True)
+      self._call_complete()
+
+  def cancel(self):
+    # cancel the running operation (its process group is terminated, then
+    # killed), or one that has not started yet
+    if self.done or self.cancelled:
+      return
+    self.cancelled = True
+    self.button_cancel.set_sensitive(False)
+    if self.operation is not None:
+      self._set_message_cancelling()
+      self.operation.cancel()
+    else:
+      self.done = True
+      self._enable_close()
+      self.button_cancel.hide()
+      self._set_message_cancelled()
+      self._call_complete()
+
+  def set_action(self, label, callback):
+    # offer a follow-up action; callback(operation_glade) is called when its
+    # button is clicked, and returns True once the action is taken (e.g. not
+    # declined in a confirmation dialog), which removes the button
+    self.action_callback = callback
+    self.button_action.set_label(label)
+    self.button_action.show()
+
+  def get_output(self):
+    # output displayed in the textview (excluding spilled output)
+    self.flush_output()
+    buf = self.textview.get_buffer()
+    return buf.get_text(buf.get_start_iter(), buf.get_end_iter(), False)
+
+  def set_output(self, text):
+    # replace all output (including spilled output) with text
+    self.pending_output = []
+    self.pending_chars = 0
+    self._remove_spill_log()
+    self.textview.get_buffer().set_text('')
+    self.output_callback(text)
+    self.flush_output()
+
+  def set_queue_position(self, position):
+    # display position while waiting for other operations to finish
+    self._set_message_queued(position)
 
   def done_callback(self, returncode):
     self.done = True
 
+    # display remaining output before reporting status
+    self.flush_output()
+    self._stop_progress(returncode == 0)
+
     # allow window to be closed
     self._enable_close()
-    
-    if returncode == 0:
+    self.button_cancel.hide()
+
+    if self.operation.timed_out:
+      # status: timed out - display message and partial terminal output
+      self._set_message_timed_out()
+      self.expand()
+      self.scroll(force=True)
+    elif self.operation.cancelled:
+      # status: cancelled - display message and partial terminal output
+      self._set_message_cancelled()
+      self.expand()
+      self.scroll(force=True)
+    elif returncode == 0:
       # status: success - display message
       self._set_message_complete()
     elif returncode is None:
@@ -157,10 +339,162 @@ class OperationGlade:
       self.expand()
       self.scroll(force=True)
 
+    if self.result_callback is not None:
+      self.result_callback(self, returncode)
+
+    self._call_complete()
+
   def output_callback(self, output):
-    # Print output to textview
+    # queue output and flush it to the textview on the next frame (or now,
+    # once enough is queued while frames are paused)
+    if isinstance(output, bytes):
+      output = self.decoder.decode(output)
+    self.pending_output.append(output)
+    self.pending_chars += len(output)
+    if self.pending_chars >= PENDING_OUTPUT_CHARS and self._frames_paused():
+      self.flush_output()
+    elif self.flush_id is None:
+      self.flush_id = self.window.add_tick_callback(self._flush_tick_callback)
+
+  def flush_output(self):
+    # print queued output to textview in a single insert and scroll once
+    if self.flush_id is not None:
+      self.window.remove_tick_callback(self.flush_id)
+      self.flush_id = None
+    if not self.pending_output:
+      return
+    output = ''.join(self.pending_output)
+    self.pending_output = []
+    self.pending_chars = 0
+    buf = self.textview.get_buffer()
+
+    # output alone exceeding the scrollback limits replaces the textview
+    # content; spill everything it displaces without inserting it
+    keep_from = _tail_start(output, self.scrollback_lines,
+                            self.scrollback_chars)
+    if keep_from > 0:
+      self._spill(buf.get_text(buf.get_start_iter(), buf.get_end_iter(),
+                               False))
+      self._spill(output[:keep_from])
+      buf.set_text(output[keep_from:])
+    else:
+      buf.insert(buf.get_end_iter(), output)
+      self._trim_scrollback()
+
+    if self.autoscroll is True:
+      self.textview.scroll_mark_onscreen(self.end_mark)
+
+  def _overdue_callback(self):
+    # warn that the operation has run past its timeout and offer to cancel
+    # it (it keeps running; interrupting it may leave its work incomplete)
+    self._set_message_overdue(self.timeout)
+    self.expand()
+    self.scroll(force=True)
+    self.window.present()
+
+  def _frames_paused(self):
+    # whether the window draws no frames (so tick callbacks do not run)
+    if not self.window.get_mapped():
+      return True
+    gdk_window = self.window.get_window()
+    return gdk_window is not None and \
+      bool(gdk_window.get_state() & Gdk.WindowState.ICONIFIED)
+
+  def _flush_tick_callback(self, widget, frame_clock):
+    self.flush_id = None
+    self.flush_output()
+    return False
+
+  def _start_progress(self):
+    # show progress bar and update it on interval
+    if self.progress is None:
+      return
+    self.progress.start()
+    self.progressbar.set_text('Measuring...')
+    self.progressbar.show()
+    self.progress_id = GObject.timeout_add_seconds(PROGRESS_INTERVAL,
+                                                   self._progress_callback)
+
+  def _stop_progress(self, complete):
+    if self.progress_id is None:
+      return
+    GObject.source_remove(self.progress_id)
+    self.progress_id = None
+    self.progress.stop()
+    if complete:
+      self.progressbar.set_fraction(1.0)
+      self.progressbar.set_text('Complete')
+
+  def _progress_callback(self):
+    # display written bytes, throughput, percent, and time remaining
+    snapshot = self.progress.sample()
+    text = bytes_to_human(snapshot.written)
+    if snapshot.total:
+      text += ' of ~%s' % bytes_to_human(snapshot.total)
+    if snapshot.rate is not None:
+      text += ' at %s/s' % bytes_to_human(snapshot.rate)
+    if snapshot.fraction is not None:
+      self.progressbar.set_fraction(snapshot.fraction)
+      text += ' (%d%%)' % (snapshot.fraction * 100)
+    else:
+      self.progressbar.pulse()
+    if snapshot.eta is not None:
+      text += ' - about %s remaining' % format_duration(snapshot.eta)
+    self.progressbar.set_text(text)
+    return True
+
+  def _trim_scrollback(self):
+    # spill the oldest textview lines exceeding the scrollback limits
     buf = self.textview.get_buffer()
-    buf.insert_at_cursor(output)
+    cut = None
+    if self.scrollback_lines is not None:
+      excess_lines = buf.get_line_count() - self.scrollback_lines
+      if excess_lines > 0:
+        cut = buf.get_iter_at_line(excess_lines)
+    if self.scrollback_chars is not None:
+      excess_chars = buf.get_char_count() - self.scrollback_chars
+      if excess_chars > 0:
+        cut_chars = buf.get_iter_at_offset(excess_chars)
+        if not cut_chars.starts_line():
+          cut_chars.forward_line()
+        if cut is None or cut_chars.compare(cut) > 0:
+          cut = cut_chars
+    if cut is not None:
+      start = buf.get_start_iter()
+      self._spill(buf.get_text(start, cut, False))
+      buf.delete(start, cut)
+
+  def _spill(self, text):
+    # append text to the spill log (created on first use)
+    if not text:
+      return
+    if self.spill_log is None:
+      self.spill_log = SpillLog()
+      self.button_earlier_output.show()
+    self.spill_log.write(text)
+
+  def _release(self):
+    # stop pending updates and remove spilled output (and its viewer)
+    if self.flush_id is not None:
+      self.window.remove_tick_callback(self.flush_id)
+      self.flush_id = None
+    self._stop_progress(False)
+    self._remove_spill_log()
+
+  def _remove_spill_log(self):
+    # remove spilled output (and its viewer)
+    if self.log_view_glade is not None:
+      self.log_view_glade.window.destroy()
+      self.log_view_glade = None
+    if self.spill_log is not None:
+      self.spill_log.close()
+      self.spill_log = None
+      self.button_earlier_output.hide()
+
+  def _call_complete(self):
+    # notify that the operation is no longer running
+    if self.complete_callback is not None:
+      self.complete_callback(self)
 
   def _enable_close(self, enabled=True):
     self.button_close.set_sensitive(enabled)
@@ -168,9 +502,33 @@ class OperationGlade:
   def _disable_close(self):
     self._enable_close(False)
 
+  def _set_message_queued(self, position):
+    self.label_status.set_markup('<i>Queued (position %d)...</i>' % position)
+
   def _set_message_working(self):
     self.label_status.set_markup('<i>Working...</i>')
 
+  def _set_message_overdue(self, timeout):
+    self.label_status.set_markup(
+      '<span foreground="#aa0000"><i>'
+      'Still working after %s. Cancelling now may leave it incomplete.'
+      '</i></span>' % format_duration(timeout))
+
+  def _set_message_cancelling(self):
+    self.label_status.set_markup('<i>Cancelling...</i>')
+
+  def _set_message_cancelled(self):
+    self.label_status.set_markup(
+      '<span foreground="#aa0000"><i>'
+      'Cancelled.'
+      '</i></span>')
+
+  def _set_message_timed_out(self):
+    self.label_status.set_markup(
+      '<span foreground="#aa0000"><i>'
+      'Timed out.'
+      '</i></span>')
+
   def _set_message_complete(self):
     self.label_status.set_markup(
       '<span foreground="#009900">'
@@ -188,3 +546,47 @@ class OperationGlade:
       '<span foreground="#aa0000"><i>'
       'Complete - status unknown... confirm output.'
       '</i></span>')
+
+
+def _tail_start(text, max_lines, max_chars):
+  # index where the tail of text fitting within max_lines/max_chars begins
+  # (at a line start), or 0 if all of text fits
+  start = 0
+  if max_chars is not None and len(text) > max_chars:
+    start = text.find('\n', len(text) - max_chars - 1) + 1
+    if start == 0:
+      start = len(text) - max_chars
+  if max_lines is not None and text:
+    # find the newline ending the line before the last max_lines lines
+    # (a trailing newline does not start another line)
+    end = len(text) - 1
+    for i in range(max_lines):
+      end = text.rfind('\n', start, end)
+      if end < 0:
+        return start
+    start = end + 1
+  return start
+
+
+class OperationGladePool:
+
+  def __init__(self, size=POOL_SIZE):
+    self.size = size
+    self.idle = []
+
+  def acquire(self, title, parent_window, **options):
+    # return a reset idle operation window, or a new one; it returns to the
+    # pool when closed (if there is room)
+    options['close_callback'] = self._release
+    if self.idle:
+      operation_glade = self.idle.pop()
+      operation_glade.reset(title, parent_window, **options)
+      return operation_glade
+    return OperationGlade(title, parent_window, **options)
+
+  def _release(self, operation_glade):
+    # keep a closed window for reuse unless the pool is full
+    if len(self.idle) >= self.size:
+      return False
+    self.idle.append(operation_glade)
+    return True
@@ -0,0 +1,103 @@
+#
+# NAME
+#
+#   operationqueue.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's operation scheduling module. Queues requested
+#   operations in order and starts them as concurrency rules allow: exclusive
+#   operations (e.g. saving) run alone, while shared operations (e.g. viewing
+#   configuration) may run alongside each other.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+class QueuedOperation:
+
+  def __init__(self, operation_glade, command, shell=False, exclusive=True,
+               timeout=None, cancel_on_timeout=True):
+    self.operation_glade = operation_glade
+    self.command = command
+    self.shell = shell
+    self.timeout = timeout
+    self.cancel_on_timeout = cancel_on_timeout
+    self.exclusive = exclusive
+
+
+class OperationQueue:
+
+  def __init__(self, running_callback=None):
+    # running_callback(count) is called when the number running changes
+    self.running_callback = running_callback
+    self.waiting = []
+    self.running = []
+
+  def submit(self, operation_glade, command, shell=False, exclusive=True,
+             timeout=None, cancel_on_timeout=True):
+    # queue an operation; it starts as soon as the rules allow
+    self.waiting.append(QueuedOperation(operation_glade, command, shell=shell,
+                                        exclusive=exclusive, timeout=timeout,
+                                        cancel_on_timeout=cancel_on_timeout))
+    self._dispatch()
+
+  def finished(self, operation_glade):
+    # release a running operation's slot, or drop a waiting (cancelled)
+    # operation, and start what can follow it
+    for entry in self.running:
+      if entry.operation_glade is operation_glade:
+        self.running.remove(entry)
+        self._notify_running()
+        self._dispatch()
+        return
+    for entry in self.waiting:
+      if entry.operation_glade is operation_glade:
+        self.waiting.remove(entry)
+        self._dispatch()
+        return
+
+  def _can_start(self, entry):
+    # exclusive operations run alone; shared operations may run together
+    if entry.exclusive:
+      return not self.running
+    return not any(running.exclusive for running in self.running)
+
+  def _dispatch(self):
+    # start waiting operations in order (later operations never overtake a
+    # waiting one, so exclusive operations are not starved)
+    started = False
+    while self.waiting and self._can_start(self.waiting[0]):
+      entry = self.waiting.pop(0)
+      self.running.append(entry)
+      started = True
+      entry.operation_glade.run_command(
+        entry.command, shell=entry.shell, timeout=entry.timeout,
+        cancel_on_timeout=entry.cancel_on_timeout)
+    if started:
+      self._notify_running()
+
+    # report queue positions to waiting operations
+    for position, entry in enumerate(self.waiting, 1):
+      entry.operation_glade.set_queue_position(position)
+
+  def _notify_running(self):
+    if self.running_callback is not None:
+      self.running_callback(len(self.running))
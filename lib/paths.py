@@ -36,5 +36,19 @@ PATH_MAIN_GLADE = '%s/lib/main.glade' % sys.path[0]
 PATH_ABOUT_GLADE = '%s/lib/about.glade' % sys.path[0]
 PATH_OPERATION_GLADE = '%s/lib/operation.glade' % sys.path[0]
 PATH_SAVE_GLADE = '%s/lib/save.glade' % sys.path[0]
+PATH_LOGVIEW_GLADE = '%s/lib/logview.glade' % sys.path[0]
+PATH_SCAN_GLADE = '%s/lib/scan.glade' % sys.path[0]
 
 PATH_MOUNT_DIR = '/mnt/wren'
+PATH_SAVE_DIR = '%s/04-save' % PATH_MOUNT_DIR
+
+PATH_PROC = '/proc'
+PATH_PROC_MEMINFO = '/proc/meminfo'
+PATH_PROC_MOUNTINFO = '/proc/self/mountinfo'
+PATH_PROC_PRESSURE_MEMORY = '/proc/pressure/memory'
+PATH_PROC_VMSTAT = '/proc/vmstat'
+PATH_SYS_DEV_BLOCK = '/sys/dev/block'
+
+# directory for spilled operation output (on the boot device, as the system
+# temporary directory is in memory on a running Wren system)
+PATH_SPILL_DIR = '%s/00-device' % PATH_MOUNT_DIR
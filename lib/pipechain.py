@@ -6,7 +6,11 @@
 # DESCRIPTION
 #
 #   Wren GUI application's multi-piped subprocess module. Accepts a set of
-#   commands to run, pipes them into one another, and stores the final output.
+#   commands to run, pipes them into one another, and stores the final output,
+#   each command's stderr output, and each command's return code. Pipelines
+#   run in their own process group (killed as a whole on timeout), either
+#   blocking or asynchronously from the GLib main loop, and their output may
+#   be post-filtered in-process instead of by additional commands.
 #
 # AUTHOR
 #
@@ -30,27 +34,242 @@
 # more details.
 #
 
-from subprocess import PIPE, STDOUT, Popen
+import os, re, select, signal, time
+from subprocess import PIPE, Popen
+
+# seconds to wait for output to close after a timed out pipeline is killed
+KILL_GRACE_TIME = 1
 
 class PipeChain:
 
   output     = ''
   returncode = 0
 
-  def __init__(self, commands):
+  def __init__(self, commands, timeout=None, filters=None, done_callback=None):
+    # commands: list of argument lists, each piped into the next
+    # timeout (seconds, optional): kill the pipeline's process group when
+    #   exceeded (returncodes of killed commands are negative signal numbers)
+    # filters (optional): callables applied in order to the final output
+    # done_callback (optional): run asynchronously from the GLib main loop
+    #   and call done_callback(pipe_chain) on completion; otherwise block
+    self.commands = commands
+    self.timeout = timeout
+    self.filters = filters
+    self.done_callback = done_callback
+
+    self.processes = []
+    self.pgid = None
+    self.returncodes = []
+    self.errors = []
+    self.timed_out = False
+    self.done = False
+
+    self._chunks = {}
+    self._streams = {}
+    self._sources = {} # live main loop sources (stream fd or 'timeout': id)
+    self._exited = 0
+
+    self._start()
+
+    if not self.processes:
+      self._finish()
+      if done_callback is not None:
+        done_callback(self)
+    elif done_callback is None:
+      self._run_blocking()
+    else:
+      self._run_async()
+
+  def kill(self, sig=signal.SIGKILL):
+    # signal every command in the pipeline
+    if self.pgid is not None and not self.done:
+      try:
+        os.killpg(self.pgid, sig)
+      except OSError:
+        pass
+
+  def _start(self):
     p_old = None
     p_new = None
-    
-    # iterate over commands, piping each's stdout into the stdin of the next
-    for command in commands:
+
+    # iterate over commands, piping each's stdout into the stdin of the next;
+    # the first command leads a new process group which the others join
+    for index, command in enumerate(self.commands):
       p_old = p_new
       if p_old == None:
-        p_new = Popen(command, stdout=PIPE)
+        p_new = Popen(command, stdout=PIPE, stderr=PIPE,
+                      preexec_fn=os.setpgrp)
+        self.pgid = p_new.pid
       else:
-        p_new = Popen(command, stdin=p_old.stdout, stdout=PIPE)
+        pgid = self.pgid
+        p_new = Popen(command, stdin=p_old.stdout, stdout=PIPE, stderr=PIPE,
+                      preexec_fn=lambda: os.setpgid(0, pgid))
         p_old.stdout.close() # allow SIG_PIPE errors to fall through
+      self.processes.append(p_new)
+      self._streams[p_new.stderr.fileno()] = index
+      self._chunks[index] = []
 
-    # store output of final command
+    # watch output of final command
     if p_new != None:
-      self.output = p_new.communicate()[0]
+      self._streams[p_new.stdout.fileno()] = 'output'
+      self._chunks['output'] = []
+
+  def _run_blocking(self):
+    deadline = None
+    if self.timeout is not None:
+      deadline = time.time() + self.timeout
+
+    # read until all output closes, killing the pipeline on timeout
+    if not self._read_until(deadline):
+      self.timed_out = True
+      self.kill()
+      self._read_until(time.time() + KILL_GRACE_TIME)
+
+    for p in self.processes:
+      p.wait()
+    self._finish()
+
+  def _read_until(self, deadline):
+    # read output streams until closed (True) or deadline passes (False)
+    poller = select.poll()
+    for fd in self._streams:
+      poller.register(fd, select.POLLIN | select.POLLHUP | select.POLLERR)
+    while self._streams:
+      remaining = None
+      if deadline is not None:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+          return False
+        remaining *= 1000
+      for fd, event in poller.poll(remaining):
+        if not self._read_stream(fd):
+          poller.unregister(fd)
+    return True
+
+  def _read_stream(self, fd):
+    # store available stream data; returns False once the stream closes
+    data = os.read(fd, 65536)
+    if data:
+      self._chunks[self._streams[fd]].append(data)
+      return True
+    del self._streams[fd]
+    return False
+
+  def _run_async(self):
+    from gi.repository import GLib
+
+    # watch output streams and command exits
+    for fd in self._streams:
+      self._sources[fd] = GLib.io_add_watch(
+        fd, GLib.PRIORITY_DEFAULT, GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR,
+        self._on_io)
+    for p in self.processes:
+      GLib.child_watch_add(GLib.PRIORITY_DEFAULT, p.pid, self._on_exit, p)
+    if self.timeout is not None:
+      self._sources['timeout'] = GLib.timeout_add(int(self.timeout * 1000),
+                                                  self._on_timeout)
+
+  def _on_io(self, fd, condition):
+    # (main loop) read output; unregister the watch once the stream closes
+    if self._read_stream(fd):
+      return True
+    del self._sources[fd]
+    self._check_async_done()
+    return False
+
+  def _on_exit(self, pid, status, process):
+    # (main loop) store the exit status reaped by GLib
+    if os.WIFSIGNALED(status):
+      process.returncode = -os.WTERMSIG(status)
+    else:
+      process.returncode = os.WEXITSTATUS(status)
+    self._exited += 1
+    self._check_async_done()
+
+  def _on_timeout(self):
+    # (main loop) kill the pipeline; output closes as its commands die
+    del self._sources['timeout']
+    self.timed_out = True
+    self.kill()
+    return False
+
+  def _check_async_done(self):
+    if self.done or self._streams or self._exited < len(self.processes):
+      return
+    # remove sources still live (those whose callbacks returned False are
+    # already gone)
+    from gi.repository import GLib
+    for source_id in self._sources.values():
+      GLib.source_remove(source_id)
+    self._sources.clear()
+    self._finish()
+    self.done_callback(self)
+
+  def _finish(self):
+    # close remaining streams (e.g. held open by escaped grandchildren)
+    for fd in list(self._streams):
+      del self._streams[fd]
+    for p in self.processes:
+      p.stdout.close()
+      p.stderr.close()
+
+    # store per-command results and (filtered) final output
+    self.returncodes = [p.returncode for p in self.processes]
+    self.errors = [b''.join(self._chunks[i])
+                   for i in range(len(self.processes))]
+    if self.processes:
+      self.output = b''.join(self._chunks['output'])
+      self.returncode = self.returncodes[-1]
+    self.output = apply_filters(self.output, self.filters)
+    self.done = True
+
+
+def apply_filters(output, filters):
+  # pass output through each filter callable in turn
+  if filters:
+    for output_filter in filters:
+      output = output_filter(output)
+  return output
+
+
+def grep_filter(pattern, invert=False):
+  # keep lines matching the regular expression (like "grep" / "grep -v")
+  regex = re.compile(pattern)
+  def grep(output):
+    return ''.join(line for line in output.splitlines(True)
+                   if bool(regex.search(line)) != invert)
+  return grep
+
+
+def squeeze_filter(chars=' '):
+  # squeeze repeated characters into one (like "tr -s")
+  regex = re.compile('([%s])\\1+' % re.escape(chars))
+  def squeeze(output):
+    return regex.sub(r'\1', output)
+  return squeeze
+
 
+def cut_filter(delimiter, fields):
+  # keep delimited fields of each line (like "cut -d <delimiter> -f <fields>")
+  # fields format: comma separated numbers and ranges (e.g. "1,3-4", "2-")
+  ranges = []
+  for field_range in fields.split(','):
+    start, _, end = field_range.partition('-')
+    start = int(start) if start else 1
+    end = int(end) if end else (None if _ else start)
+    ranges.append((start, end))
+  def cut(output):
+    lines = []
+    for line in output.splitlines(True):
+      newline = '\n' if line.endswith('\n') else ''
+      values = line.rstrip('\n').split(delimiter)
+      if len(values) == 1:
+        # lines without delimiters are passed through (as cut does)
+        lines.append(line)
+        continue
+      selected = [v for i, v in enumerate(values, 1)
+                  if any(start <= i and (end is None or i <= end)
+                         for start, end in ranges)]
+      lines.append(delimiter.join(selected) + newline)
+    return ''.join(lines)
+  return cut
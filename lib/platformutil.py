@@ -0,0 +1,103 @@
+#
+# NAME
+#
+#   platformutil.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's platform query module. Keeps a long-lived
+#   "platformutil.sh serve" helper process running, which loads the platform
+#   environment once, and passes it queries (save name, save names, grub
+#   configuration path, etc.) over a simple line protocol.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+import threading
+from subprocess import PIPE, CalledProcessError, Popen
+from lib.paths import PATH_PLATFORMUTIL_SH
+
+# start of the status line ending each answer from the helper
+RECORD_SEPARATOR = '\036'
+
+class PlatformUtil:
+
+  def __init__(self, path=PATH_PLATFORMUTIL_SH):
+    self.path = path
+    self.process = None
+    self.lock = threading.Lock() # one query at a time (callable from threads)
+
+  def query(self, operation, *args):
+    # return the output of a query operation (like check_output); raises
+    # CalledProcessError if the query fails or the helper exits
+    for value in (operation,) + args:
+      if not value or len(value.split()) != 1:
+        raise ValueError('Invalid query value: %r' % value)
+    command = [self.path, operation] + list(args)
+
+    with self.lock:
+      try:
+        process = self._helper()
+        process.stdin.write((' '.join(command[1:]) + '\n').encode('utf-8'))
+        process.stdin.flush()
+        lines = []
+        line = process.stdout.readline().decode('utf-8')
+        while line and not line.startswith(RECORD_SEPARATOR):
+          lines.append(line)
+          line = process.stdout.readline().decode('utf-8')
+        if not line:
+          raise IOError('platformutil.sh helper exited')
+        returncode = int(line[1:])
+      except (IOError, OSError, ValueError):
+        # restart the helper on next query
+        self.close()
+        raise CalledProcessError(1, command)
+
+    output = ''.join(lines)
+    if returncode != 0:
+      raise CalledProcessError(returncode, command, output)
+    return output
+
+  def close(self):
+    # end the helper (closing its input ends its query loop)
+    if self.process is not None:
+      try:
+        self.process.stdin.close()
+        self.process.stdout.close()
+      except (IOError, OSError):
+        pass
+      self.process.wait()
+      self.process = None
+
+  def _helper(self):
+    # start the helper on first use
+    if self.process is None:
+      self.process = Popen([self.path, 'serve'], stdin=PIPE, stdout=PIPE,
+                           bufsize=-1)
+    return self.process
+
+
+# shared helper used by platform_query
+_platform_util = PlatformUtil()
+
+def platform_query(operation, *args):
+  # query the platform through the shared helper process
+  return _platform_util.query(operation, *args)
@@ -74,32 +74,70 @@ test x"$1" != x \
 loadRunEnvConf || errorExit
 updateBootOptions || errorExit
 
+# answer a query operation (queries only read state, so "serve" can answer
+# many of them without reloading the platform environment)
+runQuery()
+{
+  case "$1" in
+
+    getsavename )         # return the appropriate save name for saving
+                          if test x"$BOOT_SAVE" != x; then
+                            echo "$BOOT_SAVE"
+                          elif test x"$PLATFORM_DEFAULT_SAVE" != x; then
+                            echo "$PLATFORM_DEFAULT_SAVE"
+                          else
+                            errorExit "Unable to determine save name"
+                          fi
+                          ;;
+
+    getsavenames )        # return all existing save names
+                          path_dir_saves=`getDeviceSavesDirectoryPath` \
+                            && test x"$path_dir_saves" != x \
+                            || errorExit "Unable to determine device save storage directory"
+                          if test -d "$path_dir_saves"; then
+                            saves=`getAbsoluteDirectoryList "$path_dir_saves"` \
+                              || errorExit "Unable to load save storage directory content"
+                            while IFS= read -r i; do
+                              test -d "$i" && echo `basename "$i"`
+                            done <<EOF
+$saves
+EOF
+                          fi
+                          ;;
+
+    getsavesdirectory )   # return the device save storage directory path
+                          path_dir_saves=`getDeviceSavesDirectoryPath` \
+                            && test x"$path_dir_saves" != x \
+                            || errorExit "Unable to determine device save storage directory"
+                          echo "$path_dir_saves"
+                          ;;
+
+    getgrubconfigpath )   # return the grub configuration file path
+                          echo "$path_grub_config"
+                          ;;
+
+    * )                   # fail (invalid query)
+                          errorExit "Invalid query requested: \"$1\""
+                          ;;
+  esac
+}
+
 # handle requested action
 case "$operation" in
 
-  getsavename )         # return the appropriate save name for saving
-                        if test x"$BOOT_SAVE" != x; then
-                          echo "$BOOT_SAVE"
-                        elif test x"$PLATFORM_DEFAULT_SAVE" != x; then
-                          echo "$PLATFORM_DEFAULT_SAVE"
-                        else
-                          errorExit "Unable to determine save name"
-                        fi
+  getsavename | getsavenames | getsavesdirectory | getgrubconfigpath )
+                        # answer a single query
+                        runQuery "$operation"
                         ;;
 
-  getsavenames )        # return all existing save names
-                        path_dir_saves=`getDeviceSavesDirectoryPath` \
-                          && test x"$path_dir_saves" != x \
-                          || errorExit "Unable to determine device save storage directory"
-                        if test -d "$path_dir_saves"; then
-                          saves=`getAbsoluteDirectoryList "$path_dir_saves"` \
-                            || errorExit "Unable to load save storage directory content"
-                          while IFS= read -r i; do
-                            test -d "$i" && echo `basename "$i"`
-                          done <<EOF
-$saves
-EOF
-                        fi
+  serve )               # answer queries read from stdin, one per line, until
+                        # end of input; each answer is followed by a line
+                        # holding a record separator (octal 036) and the
+                        # query's exit status
+                        while IFS= read -r query; do
+                          ( runQuery $query )
+                          printf '\036%d\n' $?
+                        done
                         ;;
 
   increasesavesize )    # increase the active save data size in memory
@@ -123,24 +161,73 @@ EOF
                         $bin_updategrub || exit $?
                         ;;
 
-  updategrub )          # update the current grub configuration
+  generategrubconfig )  # write an updated grub configuration to a file (for
+                        # comparison, and for reuse by updategrub), and
+                        # report the current configuration file path
+                        test x"$2" != x \
+                          && path_generated_config="$2" \
+                          || errorExit "Output file required"
+                        echo "Generating updated Grub configuration..."
+                        $bin_updategrub >"$path_generated_config" \
+                          || errorExit "Unable to generate updated Grub configuration"
+                        echo "- Current configuration: $path_grub_config"
+                        echo "Done."
+                        ;;
+
+  updategrub )          # update the current grub configuration (from a
+                        # file written by generategrubconfig, if provided);
+                        # the update is written to a temporary file beside
+                        # the configuration, synced, verified, and renamed
+                        # over it, so the configuration is never partially
+                        # written
                         echo "Verifying Grub configuration directory..."
                         dir_grub_config=`dirname "$path_grub_config"` \
                           && test -d "$dir_grub_config" \
                           || errorExit "Grub configuration directory not found"
-                        echo "Generating updated Grub configuration..."
-                        updated_grub_config=`$bin_updategrub` \
-                          || errorExit "Unable to generate updated Grub configuration"
+                        path_updated_config=`mktemp "$dir_grub_config/.grub.cfg.XXXXXX"` \
+                          || errorExit "Unable to create temporary file in: $dir_grub_config"
+                        trap 'rm -f "$path_updated_config"' EXIT
+                        trap 'exit 1' HUP INT TERM
+                        if test x"$2" != x; then
+                          echo "Loading generated Grub configuration..."
+                          echo "- Reading from: $2"
+                          cat "$2" >"$path_updated_config" \
+                            || errorExit "Unable to read generated Grub configuration"
+                        else
+                          echo "Generating updated Grub configuration..."
+                          $bin_updategrub >"$path_updated_config" \
+                            || errorExit "Unable to generate updated Grub configuration"
+                        fi
+                        echo "Verifying updated Grub configuration..."
+                        test -s "$path_updated_config" \
+                          || errorExit "Updated Grub configuration is empty"
+                        grep -q '^[[:space:]]*menuentry[[:space:]]' "$path_updated_config" \
+                          || errorExit "Updated Grub configuration has no menu entries"
+                        if command -v grub-script-check >/dev/null 2>&1; then
+                          grub-script-check "$path_updated_config" \
+                            || errorExit "Updated Grub configuration does not parse"
+                        fi
+                        if test -f "$path_grub_config"; then
+                          chmod --reference="$path_grub_config" "$path_updated_config"
+                        else
+                          chmod 644 "$path_updated_config"
+                        fi
+                        dd if=/dev/null of="$path_updated_config" conv=notrunc,fsync 2>/dev/null \
+                          || errorExit "Unable to sync updated Grub configuration"
                         if test -f "$path_grub_config"; then
+                          # (the current file is replaced, not modified, so
+                          # a hard link keeps it intact)
                           echo "Backing up current Grub configuration..."
-                          echo "- Copying to: $path_grub_config~"
-                          cp "$path_grub_config" "$path_grub_config~" \
-                            || errorExit "Unable to copy to: $path_grub_config~"
+                          echo "- Linking to: $path_grub_config~"
+                          ln -f "$path_grub_config" "$path_grub_config~" 2>/dev/null \
+                            || cp --reflink=auto "$path_grub_config" "$path_grub_config~" \
+                            || errorExit "Unable to back up to: $path_grub_config~"
                         fi
                         echo "Updating Grub configuration..."
-                        echo "- Writing to: $path_grub_config"
-                        echo "$updated_grub_config" >"$path_grub_config" \
-                          || errorExit "Error writing to file: $path_grub_config"
+                        echo "- Replacing: $path_grub_config"
+                        mv -f "$path_updated_config" "$path_grub_config" \
+                          || errorExit "Error replacing file: $path_grub_config"
+                        sync
                         echo "Done."
                         ;;
 
@@ -0,0 +1,215 @@
+#
+# NAME
+#
+#   pressure.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's memory pressure module. Reads pressure stall
+#   information (PSI) from /proc/pressure/memory and registers a PSI trigger
+#   whose descriptor can be polled to learn of stalls as they happen. Falls
+#   back to page reclaim and OOM kill counters from /proc/vmstat on kernels
+#   without PSI.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+import os, time
+from collections import namedtuple
+from lib.usage import read_proc_file
+from lib.paths import PATH_PROC_PRESSURE_MEMORY, PATH_PROC_VMSTAT
+
+# PSI trigger: signal when some tasks stall on memory for a total of
+# PRESSURE_TRIGGER_STALL within any PRESSURE_TRIGGER_WINDOW (microseconds;
+# without CAP_SYS_RESOURCE, e.g. in a container, the kernel only accepts
+# windows in multiples of 2 seconds)
+PRESSURE_TRIGGER_KIND = 'some'
+PRESSURE_TRIGGER_STALL = 100000
+PRESSURE_TRIGGER_WINDOW = 2000000
+
+# 10 second "some" average (percent) treated as a stall when no trigger
+# could be registered
+PRESSURE_STALL_AVERAGE = 10.0
+
+# /proc/vmstat counters summed for the fallback [attribute, field prefixes]
+# (older kernels split them per zone, e.g. pgscan_kswapd_normal)
+VMSTAT_COUNTERS = [['scanned', ['pgscan_kswapd', 'pgscan_direct']],
+                   ['reclaimed', ['pgsteal_kswapd', 'pgsteal_direct']],
+                   ['direct_scanned', ['pgscan_direct']],
+                   ['oom_kills', ['oom_kill']]]
+
+# vmstat counters that share a prefix without being part of the sum
+VMSTAT_EXCLUDED = ['pgscan_direct_throttle']
+
+# memory pressure reading: source ('psi' or 'vmstat'); percent of time some
+# or all tasks stalled on memory, averaged over 10, 60, and 300 seconds
+# (psi); bytes scanned and reclaimed per second, and OOM kills, since the
+# previous reading (vmstat); and whether a stall was detected since the
+# previous reading (unavailable values are None)
+PressureReading = namedtuple('PressureReading',
+                             ['source',
+                              'some_avg10', 'some_avg60', 'some_avg300',
+                              'full_avg10', 'full_avg60', 'full_avg300',
+                              'scanned_rate', 'reclaimed_rate', 'oom_kills',
+                              'stalled'])
+
+_EMPTY_READING = PressureReading(*([None] * len(PressureReading._fields)))
+
+
+class MemoryPressureSampler:
+
+  def __init__(self, psi_path=PATH_PROC_PRESSURE_MEMORY,
+               vmstat_path=PATH_PROC_VMSTAT):
+    self.psi_path = psi_path
+    self.vmstat_path = vmstat_path
+    self.fds = {}
+    self.page_size = os.sysconf('SC_PAGE_SIZE')
+
+    # psi is used until it proves unavailable; the trigger is registered
+    # on request
+    self.psi = True
+    self.trigger_fd = None
+    self.stalled = False
+
+    # previous vmstat counters (for deltas) and the time they were read
+    self.previous = None
+    self.previous_time = None
+
+  def open_trigger(self, stall=PRESSURE_TRIGGER_STALL,
+                   window=PRESSURE_TRIGGER_WINDOW):
+    # register a PSI trigger and return its descriptor, which polls
+    # POLLPRI on stalls (POLLERR if PSI goes away); None if unsupported
+    if self.trigger_fd is None:
+      try:
+        fd = os.open(self.psi_path, os.O_RDWR | os.O_NONBLOCK)
+      except OSError:
+        return None
+      try:
+        os.write(fd, ('%s %d %d\0' % (PRESSURE_TRIGGER_KIND, stall,
+                                      window)).encode('ascii'))
+      except OSError:
+        os.close(fd)
+        return None
+      self.trigger_fd = fd
+    return self.trigger_fd
+
+  def close_trigger(self):
+    if self.trigger_fd is not None:
+      os.close(self.trigger_fd)
+      self.trigger_fd = None
+
+  def set_stalled(self):
+    # record a stall (reported by the trigger) for the next reading
+    self.stalled = True
+
+  def sample(self):
+    # take a PressureReading (None if neither source is available)
+    stalled = self.stalled
+    self.stalled = False
+    if self.psi:
+      try:
+        return self._sample_psi(stalled)
+      except (IOError, OSError, ValueError):
+        # e.g. kernel without PSI, or booted with psi=0
+        self.psi = False
+    try:
+      return self._sample_vmstat(stalled)
+    except (IOError, OSError):
+      return None
+
+  def close(self):
+    self.close_trigger()
+    for fd in self.fds.values():
+      os.close(fd)
+    self.fds.clear()
+
+  def _sample_psi(self, stalled):
+    # format: some avg10=0.00 avg60=0.00 avg300=0.00 total=0
+    #         full avg10=0.00 avg60=0.00 avg300=0.00 total=0
+    values = {'source': 'psi'}
+    for line in self._read(self.psi_path).splitlines():
+      fields = line.split()
+      if not fields or fields[0] not in ('some', 'full'):
+        continue
+      for field in fields[1:]:
+        name, _, value = field.partition('=')
+        if name.startswith('avg'):
+          values['%s_%s' % (fields[0], name)] = float(value)
+    if 'some_avg10' not in values:
+      raise ValueError('no memory pressure averages in %s' % self.psi_path)
+
+    # without a trigger, detect stalls from the short term average
+    if self.trigger_fd is None and \
+       values['some_avg10'] >= PRESSURE_STALL_AVERAGE:
+      stalled = True
+    values['stalled'] = stalled
+    return _EMPTY_READING._replace(**values)
+
+  def _sample_vmstat(self, stalled):
+    # sum the reclaim counters (pages) and OOM kills
+    counters = dict((c[0], None) for c in VMSTAT_COUNTERS)
+    for line in self._read(self.vmstat_path).splitlines():
+      name, _, value = line.partition(' ')
+      if name in VMSTAT_EXCLUDED:
+        continue
+      for attr, prefixes in VMSTAT_COUNTERS:
+        for prefix in prefixes:
+          if name == prefix or name.startswith(prefix + '_'):
+            try:
+              counters[attr] = (counters[attr] or 0) + int(value)
+            except ValueError:
+              pass
+    now = time.time()
+    previous = self.previous
+    elapsed = now - self.previous_time if previous is not None else 0
+    self.previous = counters
+    self.previous_time = now
+
+    # rates and kills since the previous reading (none on the first);
+    # direct reclaim means allocating tasks had to wait for memory
+    values = {'source': 'vmstat', 'stalled': stalled}
+    if previous is not None and elapsed > 0:
+      delta = {}
+      for attr in counters:
+        if counters[attr] is not None and previous[attr] is not None:
+          delta[attr] = max(0, counters[attr] - previous[attr])
+      for attr in ['scanned', 'reclaimed']:
+        if attr in delta:
+          values['%s_rate' % attr] = \
+            delta[attr] * self.page_size / elapsed
+      values['oom_kills'] = delta.get('oom_kills')
+      if delta.get('direct_scanned') or delta.get('oom_kills'):
+        values['stalled'] = True
+    return _EMPTY_READING._replace(**values)
+
+  def _read(self, path):
+    try:
+      fd = self.fds.get(path)
+      if fd is None:
+        fd = self.fds[path] = os.open(path, os.O_RDONLY)
+      content = read_proc_file(fd)
+    except OSError:
+      # reopen on next reading
+      fd = self.fds.pop(path, None)
+      if fd is not None:
+        os.close(fd)
+      raise
+    return content.decode('ascii', 'replace')
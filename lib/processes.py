@@ -0,0 +1,192 @@
+#
+# NAME
+#
+#   processes.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's process memory module. Measures the memory held
+#   by each process (PSS, RSS, and swap from /proc/<pid>/smaps_rollup, or RSS
+#   from /proc/<pid>/statm) a few processes at a time, keeping the latest
+#   measurement of every process, so listing the largest processes does not
+#   cost a full /proc sweep on every sample.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+import errno, heapq, os, time
+from collections import deque, namedtuple
+from lib.paths import PATH_PROC
+
+# processes measured per sample, and the time they may take (smaps_rollup
+# takes longer for processes with many mappings); listed processes also have
+# their RSS refreshed from statm on every sample
+PROCESS_BATCH = 32
+PROCESS_BATCH_TIME = 0.005
+
+# largest processes reported by each measure
+PROCESS_TOP = 10
+
+# process memory sort keys [key, measure]
+PROCESS_KEYS = [['pss', lambda p: p.pss if p.pss is not None else p.rss],
+                ['rss', lambda p: p.rss],
+                ['swap', lambda p: p.swap or 0]]
+
+# latest measurement of a process (bytes; pss and swap are None when
+# measured from statm)
+ProcessMemory = namedtuple('ProcessMemory', 'pid name pss rss swap')
+
+# smaps_rollup fields retained [attribute, field name]
+ROLLUP_FIELDS = [['pss', 'Pss'], ['rss', 'Rss'], ['swap', 'Swap']]
+
+
+class ProcessSampler:
+
+  def __init__(self, proc_path=PATH_PROC, batch=PROCESS_BATCH,
+               batch_time=PROCESS_BATCH_TIME, top=PROCESS_TOP):
+    self.proc_path = proc_path
+    self.batch = batch
+    self.batch_time = batch_time
+    self.top = top
+    self.page_size = os.sysconf('SC_PAGE_SIZE')
+    self.fields = dict((f[1], f[0]) for f in ROLLUP_FIELDS)
+
+    # smaps_rollup requires linux 4.14 (statm is used without it)
+    self.rollup = os.path.exists('%s/self/smaps_rollup' % proc_path)
+
+    self.reset()
+
+  def reset(self):
+    # forget all measurements
+    self.processes = {}   # pid: ProcessMemory
+    self.pending = deque() # pids still to be measured in this rotation
+
+  def sample(self):
+    # measure the next batch of processes, refresh the RSS of those listed,
+    # and return the largest processes by each measure (largest PSS first)
+    if not self.processes:
+      # rank every process by RSS to start (statm is cheap to read); later
+      # samples refine the measurements
+      for pid in self._list_pids():
+        self._measure(pid, rollup=False)
+    if not self.pending:
+      self._rotate()
+
+    measured = set()
+    deadline = time.time() + self.batch_time
+    while self.pending and len(measured) < self.batch:
+      pid = self.pending.popleft()
+      self._measure(pid)
+      measured.add(pid)
+      if time.time() >= deadline:
+        break
+    for process in self._top():
+      if process.pid not in measured:
+        self._refresh(process.pid)
+    return self._top()
+
+  def count(self):
+    # processes with a measurement
+    return len(self.processes)
+
+  def _top(self):
+    # union of the largest processes by each measure (those using none of
+    # a measure are left out, e.g. processes without swapped out memory)
+    top = {}
+    for key, measure in PROCESS_KEYS:
+      for process in heapq.nlargest(self.top, self.processes.values(),
+                                    key=measure):
+        if measure(process):
+          top[process.pid] = process
+    return sorted(top.values(), key=PROCESS_KEYS[0][1], reverse=True)
+
+  def _rotate(self):
+    # start measuring every current process in turn (forgetting those that
+    # have exited)
+    pids = self._list_pids()
+    current = set(pids)
+    for pid in [p for p in self.processes if p not in current]:
+      del self.processes[pid]
+    self.pending.extend(pids)
+
+  def _list_pids(self):
+    try:
+      return [int(name) for name in os.listdir(self.proc_path)
+              if name.isdigit()]
+    except OSError:
+      return []
+
+  def _measure(self, pid, rollup=True):
+    # take a process's measurement (forgetting it once it has exited)
+    try:
+      memory = None
+      if rollup and self.rollup:
+        memory = self._read_rollup(pid)
+      if memory is None:
+        memory = self._read_statm(pid)
+      previous = self.processes.get(pid)
+      if previous is not None:
+        name = previous.name
+      else:
+        name = _read(self._path(pid, 'comm')).strip()
+    except (IOError, OSError, ValueError, IndexError):
+      # exited, or a kernel thread (without memory of its own)
+      self.processes.pop(pid, None)
+      return
+    self.processes[pid] = ProcessMemory(pid, name, *memory)
+
+  def _refresh(self, pid):
+    # update a process's RSS (keeping its last PSS and swap)
+    try:
+      rss = self._read_statm(pid)[1]
+    except (IOError, OSError, ValueError, IndexError):
+      self.processes.pop(pid, None)
+      return
+    self.processes[pid] = self.processes[pid]._replace(rss=rss)
+
+  def _read_rollup(self, pid):
+    # (pss, rss, swap) from smaps_rollup (None if not permitted)
+    try:
+      text = _read(self._path(pid, 'smaps_rollup'))
+    except (IOError, OSError) as e:
+      if e.errno == errno.EACCES:
+        return None
+      raise
+    values = {}
+    for line in text.splitlines():
+      name, _, value = line.partition(':')
+      attr = self.fields.get(name)
+      if attr is not None:
+        values[attr] = int(value.split()[0]) * 1024
+    return [values.get(f[0], 0) for f in ROLLUP_FIELDS]
+
+  def _read_statm(self, pid):
+    # (pss, rss, swap) from statm (resident pages only)
+    fields = _read(self._path(pid, 'statm')).split()
+    return [None, int(fields[1]) * self.page_size, None]
+
+  def _path(self, pid, name):
+    return '%s/%d/%s' % (self.proc_path, pid, name)
+
+
+def _read(path):
+  with open(path, 'rb') as proc_file:
+    return proc_file.read().decode('utf-8', 'replace')
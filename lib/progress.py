@@ -0,0 +1,153 @@
+#
+# NAME
+#
+#   progress.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's save progress estimation module. Measures how much
+#   has been written to the device while a save runs (device I/O counters and
+#   file system usage) and compares it against the active save data size to
+#   estimate throughput, completion, and time remaining.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+import os, time
+from collections import namedtuple
+from lib.usage import MountIndex
+from lib.paths import PATH_SYS_DEV_BLOCK
+
+# weight of the newest throughput reading in the smoothed rate (0.0 - 1.0)
+RATE_SMOOTHING = 0.3
+
+# highest completion fraction reported while the save is still running
+# (the save file may be compressed, so the active save size is an estimate)
+MAX_RUNNING_FRACTION = 0.99
+
+# progress reading; fraction and eta (seconds) are None when unknown
+ProgressSnapshot = namedtuple('ProgressSnapshot',
+                              ['timestamp', 'written', 'total', 'rate',
+                               'fraction', 'eta'])
+
+
+class SaveProgress:
+
+  def __init__(self, mount_index=None):
+    self.mount_index = mount_index if mount_index is not None else MountIndex()
+    self.device_path = None
+    self.stat_path = None
+    self.total = None
+    self.rate = None
+
+  def start(self):
+    # record baselines when the save starts
+    self.mount_index.update()
+    device = self.mount_index.get('00-device')
+    save = self.mount_index.get('04-save')
+
+    self.device_path = device.mount_point if device is not None else None
+    self.stat_path = None
+    if device is not None:
+      self.stat_path = '%s/%d:%d/stat' % (PATH_SYS_DEV_BLOCK, device.major,
+                                          device.minor)
+    self.total = None
+    if save is not None:
+      self.total = _used_bytes(save.mount_point)
+
+    self.base_used = _used_bytes(self.device_path)
+    self.base_io = _bytes_written(self.stat_path)
+    self.rate = None
+    self.last_time = time.time()
+    self.last_written = 0
+
+  def stop(self):
+    # release the mount index (reopened if the save is started again)
+    self.mount_index.close()
+
+  def sample(self):
+    # take a reading (one statvfs and one small sysfs read)
+    now = time.time()
+    written = self._written()
+
+    # smooth throughput across readings
+    elapsed = now - self.last_time
+    if elapsed > 0:
+      rate = max(0, written - self.last_written) / elapsed
+      if self.rate is None:
+        self.rate = rate
+      else:
+        self.rate += RATE_SMOOTHING * (rate - self.rate)
+    self.last_time = now
+    self.last_written = written
+
+    fraction = eta = None
+    if self.total:
+      fraction = min(float(written) / self.total, MAX_RUNNING_FRACTION)
+      if self.rate:
+        eta = max(0, self.total - written) / self.rate
+    return ProgressSnapshot(now, written, self.total, self.rate, fraction, eta)
+
+  def _written(self):
+    # prefer device write counters (which only grow); fall back to the
+    # device file system's used space
+    io = _bytes_written(self.stat_path)
+    if io is not None and self.base_io is not None:
+      return max(0, io - self.base_io)
+    used = _used_bytes(self.device_path)
+    if used is not None and self.base_used is not None:
+      return max(0, used - self.base_used)
+    return 0
+
+
+def format_duration(seconds):
+  # format a duration for display (e.g. "45s", "3m 20s", "2h 05m")
+  seconds = int(round(seconds))
+  if seconds < 60:
+    return '%ds' % seconds
+  if seconds < 3600:
+    return '%dm %02ds' % (seconds // 60, seconds % 60)
+  if seconds < 86400:
+    return '%dh %02dm' % (seconds // 3600, seconds % 3600 // 60)
+  return '%dd %02dh' % (seconds // 86400, seconds % 86400 // 3600)
+
+
+def _used_bytes(path):
+  # used bytes of the file system containing path (None if unavailable)
+  if path is None:
+    return None
+  try:
+    stat = os.statvfs(path)
+  except OSError:
+    return None
+  return (stat.f_blocks - stat.f_bfree) * stat.f_frsize
+
+
+def _bytes_written(stat_path):
+  # bytes written to a block device according to its sysfs stat file
+  # (field 7: sectors written, in 512 byte units)
+  if stat_path is None:
+    return None
+  try:
+    with open(stat_path) as stat_file:
+      return int(stat_file.read().split()[6]) * 512
+  except (IOError, OSError, IndexError, ValueError):
+    return None
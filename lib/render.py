@@ -0,0 +1,69 @@
+#
+# NAME
+#
+#   render.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's change-detecting label renderer. Remembers the
+#   text, color, and tooltip last rendered to each label and only updates
+#   widgets whose content changed, avoiding needless relayout and redraw.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+class LabelRenderer:
+
+  def __init__(self):
+    # last rendered state per label: (text, color, tooltip)
+    self.rendered = {}
+
+  def set_label(self, label, text, color=None, tooltip=None):
+    # update label text/color and tooltip, skipping unchanged parts;
+    # returns True if the label was touched
+    previous = self.rendered.get(label)
+    state = (text, color, tooltip)
+    if previous == state:
+      return False
+
+    # set text with (optional) requested color
+    if previous is None or previous[0:2] != state[0:2]:
+      if color is None:
+        label.set_text(text)
+      else:
+        label.set_markup('<span foreground="%s">%s</span>' % (color, text))
+
+    # set tooltip
+    if previous is None or previous[2] != tooltip:
+      if tooltip is None:
+        label.set_has_tooltip(False)
+      else:
+        label.set_tooltip_text(tooltip)
+
+    self.rendered[label] = state
+    return True
+
+  def forget(self, label=None):
+    # force the next update of label (or of all labels) to be rendered
+    if label is None:
+      self.rendered.clear()
+    else:
+      self.rendered.pop(label, None)
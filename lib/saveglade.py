@@ -32,20 +32,22 @@
 #
 
 from gi.repository import Gtk, Gdk
-from subprocess import CalledProcessError, check_output
-from lib.operationglade import OperationGlade
-from lib.paths import PATH_PLATFORMUTIL_SH, PATH_SAVE_GLADE
+from lib.savenames import SaveNameCache
+from lib.gladecache import add_from_cache
+from lib.paths import PATH_SAVE_GLADE
 
 class SaveGlade:
 
-  def __init__(self, title, parent_window, ok_callback, cancel_callback=None):
+  def __init__(self, title, parent_window, ok_callback, cancel_callback=None,
+               save_name_cache=None):
     self.parent_window = parent_window
     self.ok_callback = ok_callback
     self.cancel_callback = cancel_callback
+    self.save_name_cache = save_name_cache
 
     # load save glade and connect signals
     builder = self.builder = Gtk.Builder()
-    builder.add_from_file(PATH_SAVE_GLADE)
+    add_from_cache(builder, PATH_SAVE_GLADE)
     builder.connect_signals(self)
 
     # reference window and required child elements
@@ -65,38 +67,13 @@ class SaveGlade:
 
     # prepare save names combobox
     comboboxtext.set_entry_text_column(0)
+    button_ok.set_sensitive(False)
 
-    # load existing save names
-    save_names = []
-    try:
-      save_names = check_output([PATH_PLATFORMUTIL_SH, 'getsavenames'])\
-        .strip().split('\n')
-    except CalledProcessError:
-      pass
-
-    # load current save name (from boot or platform)
-    save_name = ''
-    save_name_index = -1
-    try:
-      save_name = check_output([PATH_PLATFORMUTIL_SH, 'getsavename']).strip()
-      save_name_index = save_names.index(save_name)
-    except CalledProcessError:
-      pass
-    except ValueError:
-      pass
-
-    # add save names to combobox
-    for value in save_names:
-      comboboxtext.append_text(value)
-
-    # populate editable entry
-    if save_name_index >= 0:
-      comboboxtext.set_active(save_name_index)
-    elif save_name:
-      comboboxtext_entry.set_text(save_name)
-    else:
-      button_ok.set_sensitive(False)
-
+    # load save names (immediately if cached, otherwise in the background)
+    if save_name_cache is None:
+      save_name_cache = self.save_name_cache = SaveNameCache()
+    comboboxtext_entry.set_placeholder_text('Loading save names...')
+    save_name_cache.get(self.set_save_names)
 
   ### SIGNALS
 
@@ -126,8 +103,24 @@ class SaveGlade:
   def show(self):
     self.window.show()
 
+  def set_save_names(self, save_names, save_name):
+    # add save names to combobox
+    self.comboboxtext_entry.set_placeholder_text('')
+    for value in save_names:
+      self.comboboxtext.append_text(value)
+
+    # populate editable entry (unless the user already typed a name)
+    if self.comboboxtext_entry.get_text():
+      return
+    try:
+      self.comboboxtext.set_active(save_names.index(save_name))
+    except ValueError:
+      if save_name:
+        self.comboboxtext_entry.set_text(save_name)
+
   def call_ok(self):
     # close window and initiate ok_callback with selected save name
+    self.save_name_cache.cancel(self.set_save_names)
     self.window.hide()
     if self.ok_callback is not None:
       self.ok_callback(self.comboboxtext_entry.get_text())
@@ -135,6 +128,7 @@ class SaveGlade:
 
   def call_cancel(self):
     # close window and initiate cancel_callback
+    self.save_name_cache.cancel(self.set_save_names)
     self.window.destroy()
     if self.cancel_callback is not None:
       self.cancel_callback()
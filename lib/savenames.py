@@ -0,0 +1,170 @@
+#
+# NAME
+#
+#   savenames.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's save name cache module. Loads existing save names
+#   and the current save name in the background and keeps them until inotify
+#   reports a change to the device save storage directory.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+import os, threading
+from subprocess import CalledProcessError
+from gi.repository import GObject
+from lib.inotify import Inotify, IN_DIRECTORY_CHANGES, IN_IGNORED, IN_ONLYDIR
+from lib.platformutil import platform_query
+
+class SaveNameCache:
+
+  def __init__(self):
+    self.save_names = None # cached names (None when not loaded or invalid)
+    self.save_name = None  # current save name (constant while running)
+    self.callbacks = []
+    self.loading = False
+    self.generation = 0    # incremented on invalidation
+
+    # directory watch (no caching of save names without one)
+    self.inotify = None
+    self.saves_directory = None
+    self.watch = None
+    self.io_id = None
+
+  def get(self, callback):
+    # call callback(save_names, save_name) with cached values (immediately)
+    # or once loaded in the background (from the main loop)
+    if self.save_names is not None:
+      callback(self.save_names, self.save_name)
+      return
+    self.callbacks.append(callback)
+    if not self.loading:
+      self.loading = True
+      thread = threading.Thread(target=self._load, args=(self.generation,),
+                                name='save-name-loader')
+      thread.daemon = True
+      thread.start()
+
+  def cancel(self, callback):
+    # forget a callback still waiting for save names
+    if callback in self.callbacks:
+      self.callbacks.remove(callback)
+
+  def invalidate(self):
+    self.save_names = None
+    self.generation += 1
+
+  def _load(self, generation):
+    # (thread) query the platform for save names
+    saves_directory = None
+    directory_key = None
+    save_names = []
+    save_name = self.save_name
+    loaded = False
+    try:
+      try:
+        saves_directory = platform_query('getsavesdirectory').strip()
+      except CalledProcessError:
+        pass
+      if saves_directory:
+        directory_key = _directory_key(saves_directory)
+      try:
+        save_names = [name for name in
+                      platform_query('getsavenames').strip().split('\n')
+                      if name]
+      except CalledProcessError:
+        pass
+      if save_name is None:
+        try:
+          save_name = platform_query('getsavename').strip()
+        except CalledProcessError:
+          save_name = ''
+      loaded = True
+    finally:
+      # always end the load (without caching results if a query failed
+      # unexpectedly)
+      if not loaded:
+        saves_directory = None
+      GObject.idle_add(self._loaded, generation, saves_directory,
+                       directory_key, save_names, save_name)
+
+  def _loaded(self, generation, saves_directory, directory_key, save_names,
+              save_name):
+    # (main loop) cache results if still valid and a watch is in place (the
+    # saves directory must be unchanged since before it was listed, as
+    # changes are only seen once the watch is added)
+    self.loading = False
+    self.save_name = save_name
+    if generation == self.generation and self._watch(saves_directory) and \
+       directory_key is not None and \
+       _directory_key(saves_directory) == directory_key:
+      self.save_names = save_names
+
+    callbacks = self.callbacks
+    self.callbacks = []
+    for callback in callbacks:
+      callback(save_names, save_name)
+    return False
+
+  def _watch(self, saves_directory):
+    # watch the saves directory for added, removed, or renamed saves;
+    # returns False if it cannot be watched
+    if not saves_directory:
+      return False
+    if self.watch is not None and saves_directory == self.saves_directory:
+      return True
+    try:
+      if self.inotify is None:
+        self.inotify = Inotify()
+        self.io_id = GObject.io_add_watch(self.inotify.fileno(),
+                                          GObject.IO_IN,
+                                          self._inotify_callback)
+      if self.watch is not None:
+        self.inotify.remove_watch(self.watch)
+        self.watch = None
+      self.watch = self.inotify.add_watch(saves_directory,
+                                          IN_DIRECTORY_CHANGES | IN_ONLYDIR)
+      self.saves_directory = saves_directory
+    except OSError:
+      # e.g. no saves directory yet, or inotify unavailable
+      return False
+    return True
+
+  def _inotify_callback(self, fd, condition):
+    # (main loop) saves directory changed - reload on next request
+    for wd, mask, name in self.inotify.read_events():
+      if wd == self.watch and mask & IN_IGNORED:
+        # directory removed (watch gone)
+        self.watch = None
+    self.invalidate()
+    return True
+
+
+def _directory_key(path):
+  # (inode, mtime) identifying a directory's entries (None if unreadable)
+  try:
+    stat_result = os.stat(path)
+  except OSError:
+    return None
+  return (stat_result.st_ino,
+          getattr(stat_result, 'st_mtime_ns', stat_result.st_mtime))
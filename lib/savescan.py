@@ -0,0 +1,330 @@
+#
+# NAME
+#
+#   savescan.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's save space scanning module. Walks the save overlay
+#   with a pool of threads to find the largest directories and files, with
+#   partial results available while the scan runs. Directory listings (entry
+#   names and types) are cached and reused while a directory's (inode, mtime)
+#   is unchanged, so a re-scan only lists changed directories; files are
+#   measured again on every scan, as they may grow in place (e.g. logs).
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+import heapq, os, stat, threading, traceback
+from collections import namedtuple
+try:
+  from queue import Queue
+except ImportError:
+  from Queue import Queue
+try:
+  from os import scandir
+except ImportError:
+  try:
+    # python 2 backport (optional; falls back to listdir and lstat)
+    from scandir import scandir
+  except ImportError:
+    scandir = None
+
+# scanning threads (listing and stat calls release the interpreter lock, so
+# threads overlap their waits on the disk)
+SCAN_THREADS = 4
+
+# largest directories and files reported
+SCAN_TOP = 20
+
+# listing of a scanned directory: the (inode, mtime) it is valid for, and
+# the names of its files (all entries other than directories) and of its
+# subdirectories
+ScannedDirectory = namedtuple('ScannedDirectory', 'key files subdirectories')
+
+# scan progress and (partial) results; directories and files are
+# [(bytes, path)], largest first
+ScanResults = namedtuple('ScanResults',
+                         'total directories files scanned cached errors '
+                         'finished cancelled')
+
+
+class ScanCache:
+  # directory listings by path, kept between scans (a listing is reused
+  # while the directory's inode and mtime are unchanged, which they are until
+  # an entry is added to, removed from, or renamed within it)
+
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.directories = {}
+
+  def get(self, path, stat_result):
+    # cached listing of path if still valid, or None
+    with self.lock:
+      listing = self.directories.get(path)
+    if listing is None or listing.key != _stat_key(stat_result):
+      return None
+    return listing
+
+  def put(self, path, listing):
+    with self.lock:
+      self.directories[path] = listing
+
+  def retain(self, paths):
+    # forget listings of directories not in paths (e.g. removed ones)
+    with self.lock:
+      for path in [p for p in self.directories if p not in paths]:
+        del self.directories[path]
+
+  def clear(self):
+    with self.lock:
+      self.directories.clear()
+
+
+class SaveScanner:
+
+  def __init__(self, root, cache=None, threads=SCAN_THREADS, top=SCAN_TOP):
+    self.root = root
+    self.cache = cache if cache is not None else ScanCache()
+    self.thread_count = threads
+    self.top = top
+
+    # directories waiting to be (or being) scanned
+    self.queue = Queue()
+    self.pending = 0
+
+    # results so far: bytes below each directory (including its own) and
+    # each directory's parent, a min-heap of the largest files, and the hard
+    # linked inodes already counted
+    self.lock = threading.Lock()
+    self.totals = {}
+    self.parents = {}
+    self.files = []
+    self.linked = set()
+    self.scanned = 0
+    self.cached = 0
+    self.errors = 0
+    self.device = None
+
+    self.started = False
+    self.finished = False
+    self.cancelled = False
+
+  def start(self):
+    # start scanning on background threads
+    self.started = True
+    try:
+      self.device = os.lstat(self.root).st_dev
+    except OSError:
+      self.errors += 1
+      self.finished = True
+      return
+    self.totals[self.root] = 0
+    self.parents[self.root] = None
+    self.pending = 1
+    self.queue.put(self.root)
+    for i in range(self.thread_count):
+      thread = threading.Thread(target=self._work, name='save-scan-%d' % i)
+      thread.daemon = True
+      thread.start()
+
+  def cancel(self):
+    # stop scanning (directories being listed are completed and cached)
+    self.cancelled = True
+
+  def results(self):
+    # snapshot of the results so far
+    with self.lock:
+      totals = dict(self.totals)
+      files = list(self.files)
+      counts = (self.scanned, self.cached, self.errors, self.finished,
+                self.cancelled)
+    total = totals.pop(self.root, 0)
+    directories = heapq.nlargest(self.top, [(size, path) for path, size
+                                            in totals.items() if size > 0])
+    return ScanResults(total, directories, sorted(files, reverse=True),
+                       *counts)
+
+  def _work(self):
+    while True:
+      path = self.queue.get()
+      if path is None:
+        return
+      try:
+        if not self.cancelled:
+          self._scan_directory(path)
+      except Exception:
+        # keep scanning; a failed directory only costs its own results
+        traceback.print_exc()
+      finally:
+        self._task_done()
+
+  def _scan_directory(self, path):
+    # list path (or reuse its cached listing), measure its files, then
+    # record its sizes and queue its subdirectories (those on other file
+    # systems are skipped)
+    cached = True
+    try:
+      stat_result = os.lstat(path)
+      if stat_result.st_dev != self.device:
+        return
+      listing = self.cache.get(path, stat_result)
+      if listing is None:
+        cached = False
+        listing, file_stats = _read_directory(path, stat_result)
+        self.cache.put(path, listing)
+      else:
+        file_stats = _stat_files(path, listing.files)
+      own_bytes, files, linked = _measure_files(stat_result, file_stats,
+                                                self.top)
+    except OSError:
+      with self.lock:
+        self.errors += 1
+      return
+
+    subdirectories = [os.path.join(path, name)
+                      for name in listing.subdirectories]
+    with self.lock:
+      self.scanned += 1
+      if cached:
+        self.cached += 1
+
+      # add own bytes (and those of hard linked files not yet counted) to
+      # the directory and all its ancestors
+      for inode, size in linked:
+        if inode not in self.linked:
+          self.linked.add(inode)
+          own_bytes += size
+      parent = path
+      while parent is not None:
+        self.totals[parent] += own_bytes
+        parent = self.parents[parent]
+
+      for size, name in files:
+        item = (size, os.path.join(path, name))
+        if len(self.files) < self.top:
+          heapq.heappush(self.files, item)
+        elif item > self.files[0]:
+          heapq.heapreplace(self.files, item)
+
+      for subdirectory in subdirectories:
+        self.totals[subdirectory] = 0
+        self.parents[subdirectory] = path
+      self.pending += len(subdirectories)
+
+    for subdirectory in subdirectories:
+      self.queue.put(subdirectory)
+
+  def _task_done(self):
+    # finish once no directories are pending (stopping the threads)
+    with self.lock:
+      self.pending -= 1
+      if self.pending > 0:
+        return
+      self.finished = True
+      paths = set(self.totals)
+    for i in range(self.thread_count):
+      self.queue.put(None)
+    if not self.cancelled:
+      self.cache.retain(paths)
+
+
+def _read_directory(path, stat_result):
+  # list path into a ScannedDirectory, also returning the lstat results of
+  # its files [(name, lstat result or None)]
+  files = []
+  subdirectories = []
+  file_stats = []
+  for name, is_directory, entry_stat in _list_directory(path):
+    if is_directory:
+      subdirectories.append(name)
+    else:
+      files.append(name)
+      file_stats.append((name, entry_stat))
+  return (ScannedDirectory(_stat_key(stat_result), files, subdirectories),
+          file_stats)
+
+
+def _stat_files(path, names):
+  # lstat results of the files of a cached listing [(name, lstat result or
+  # None)]
+  file_stats = []
+  for name in names:
+    try:
+      file_stats.append((name, os.lstat(os.path.join(path, name))))
+    except OSError:
+      file_stats.append((name, None))
+  return file_stats
+
+
+def _measure_files(stat_result, file_stats, top):
+  # bytes used by a directory and its files, its largest files
+  # [(bytes, name)], and its hard linked files [(inode, bytes)] (counted once
+  # per scan, wherever first found, instead of in own bytes); sizes are
+  # allocated bytes, as used on the disk
+  own_bytes = _allocated_bytes(stat_result)
+  files = []
+  linked = []
+  for name, entry_stat in file_stats:
+    if entry_stat is None or stat.S_ISDIR(entry_stat.st_mode):
+      continue
+    size = _allocated_bytes(entry_stat)
+    if entry_stat.st_nlink > 1:
+      linked.append((entry_stat.st_ino, size))
+    else:
+      own_bytes += size
+    if len(files) < top:
+      heapq.heappush(files, (size, name))
+    elif size > files[0][0]:
+      heapq.heapreplace(files, (size, name))
+  return own_bytes, sorted(files, reverse=True), linked
+
+
+def _list_directory(path):
+  # yield (name, is directory, lstat result or None) for entries of path
+  # (directories are not stat'd here)
+  if scandir is not None:
+    for entry in scandir(path):
+      try:
+        if entry.is_dir(follow_symlinks=False):
+          yield entry.name, True, None
+        else:
+          yield entry.name, False, entry.stat(follow_symlinks=False)
+      except OSError:
+        yield entry.name, False, None
+    return
+  for name in os.listdir(path):
+    try:
+      entry_stat = os.lstat(os.path.join(path, name))
+    except OSError:
+      yield name, False, None
+      continue
+    yield name, stat.S_ISDIR(entry_stat.st_mode), entry_stat
+
+
+def _allocated_bytes(stat_result):
+  return stat_result.st_blocks * 512
+
+
+def _stat_key(stat_result):
+  # (inode, mtime) identifying a directory's contents
+  return (stat_result.st_ino,
+          getattr(stat_result, 'st_mtime_ns', stat_result.st_mtime))
@@ -0,0 +1,186 @@
+#
+# NAME
+#
+#   scanglade.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's "save space usage" window. Scans the save overlay
+#   in the background and lists its largest directories and files, updating
+#   the lists as the scan progresses.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+from gi.repository import Gtk, Gdk, GObject
+from lib.savescan import SaveScanner
+from lib.usage import bytes_to_human
+from lib.gladecache import add_from_cache
+from lib.paths import PATH_SCAN_GLADE
+
+# partial results display interval (in milliseconds)
+SCAN_REFRESH_INTERVAL = 500
+
+class ScanGlade:
+
+  def __init__(self, parent_window, root, scan_cache=None):
+    self.root = root
+    self.scan_cache = scan_cache
+
+    # load scan glade and connect signals
+    builder = self.builder = Gtk.Builder()
+    add_from_cache(builder, PATH_SCAN_GLADE)
+    builder.connect_signals(self)
+
+    # reference window and required child elements
+    window = self.window = builder.get_object('window1')
+    self.label_status = builder.get_object('label_status')
+    self.spinner = builder.get_object('spinner1')
+    self.liststore_directories = builder.get_object('liststore_directories')
+    self.liststore_files = builder.get_object('liststore_files')
+    self.button_rescan = builder.get_object('button_rescan')
+    self.button_cancel = builder.get_object('button_cancel')
+
+    # set window title
+    window.set_title('Save Space Usage (%s)' % _display_path(root))
+
+    # set window as overlay of parent window
+    if parent_window is not None:
+      window.set_transient_for(parent_window)
+
+    # running scan, its display timer, and the results displayed
+    self.scanner = None
+    self.refresh_id = None
+    self.displayed = None
+
+    self.scan()
+
+  ### SIGNALS
+
+  def on_window1_key_press_event(self, widget, event):
+    # close window when escape key is pressed
+    if event.keyval == Gdk.KEY_Escape:
+      self.window.destroy()
+
+  def on_window1_destroy(self, window, data=None):
+    # stop scanning (completed directories stay cached for the next scan)
+    self._stop()
+
+  def on_button_rescan_clicked(self, widget, data=None):
+    self.scan()
+
+  def on_button_cancel_clicked(self, widget, data=None):
+    if self.scanner is not None:
+      self.scanner.cancel()
+      self.button_cancel.set_sensitive(False)
+      self.refresh()
+
+  def on_button_close_clicked(self, widget, data=None):
+    self.window.destroy()
+
+  ### METHODS
+
+  def show(self):
+    self.window.show()
+
+  def scan(self):
+    # (re)start scanning, reusing cached listings of unchanged directories
+    self._stop()
+    self.scanner = SaveScanner(self.root, self.scan_cache)
+    self.scanner.start()
+    self.spinner.start()
+    self.button_rescan.set_sensitive(False)
+    self.button_cancel.set_sensitive(True)
+    self.refresh_id = GObject.timeout_add(SCAN_REFRESH_INTERVAL,
+                                          self._refresh_callback)
+    self.refresh()
+
+  def refresh(self):
+    # display the results so far; returns False once the scan has finished
+    results = self.scanner.results()
+    self.label_status.set_text(_status_text(self.root, results))
+    if results[0:3] != self.displayed:
+      self.displayed = results[0:3]
+      for liststore, entries in [[self.liststore_directories,
+                                  results.directories],
+                                 [self.liststore_files, results.files]]:
+        liststore.clear()
+        for size, path in entries:
+          liststore.append([bytes_to_human(size),
+                            _share_text(size, results.total),
+                            _display_path(self._relative_path(path))])
+
+    if not results.finished:
+      return True
+    self.spinner.stop()
+    self.button_rescan.set_sensitive(True)
+    self.button_cancel.set_sensitive(False)
+    return False
+
+  def _refresh_callback(self):
+    if self.refresh():
+      return True
+    self.refresh_id = None
+    return False
+
+  def _stop(self):
+    # cancel any running scan and its display timer
+    if self.refresh_id is not None:
+      GObject.source_remove(self.refresh_id)
+      self.refresh_id = None
+    if self.scanner is not None:
+      self.scanner.cancel()
+
+  def _relative_path(self, path):
+    # path below the scanned directory (e.g. "/usr/lib")
+    return path[len(self.root):] or '/'
+
+
+def _status_text(root, results):
+  # scan progress (or outcome) for display
+  if results.finished and not results.scanned and results.errors:
+    return 'Unable to read %s' % _display_path(root)
+  text = '%s in %d directories' % (bytes_to_human(results.total),
+                                   results.scanned)
+  if results.cached:
+    text += ' (%d directory listings reused)' % results.cached
+  if results.errors:
+    text += ', %d unreadable' % results.errors
+  if not results.finished:
+    if results.cancelled:
+      return 'Cancelling... %s so far' % text
+    return 'Scanning... %s so far' % text
+  if results.cancelled:
+    return 'Cancelled (partial results): %s' % text
+  return text
+
+
+def _share_text(size, total):
+  if not total:
+    return ''
+  return '%.1f%%' % (100.0 * size / total)
+
+
+def _display_path(path):
+  # path as text (undecodable file name bytes replaced)
+  if not isinstance(path, bytes):
+    path = path.encode('utf-8', 'surrogateescape')
+  return path.decode('utf-8', 'replace')
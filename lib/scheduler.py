@@ -0,0 +1,105 @@
+#
+# NAME
+#
+#   scheduler.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's adaptive polling module. Chooses the usage sampling
+#   interval from main window visibility and running operations, backing off
+#   while the window cannot be seen and speeding up while operations run.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+from gi.repository import Gdk
+
+# default sampling intervals (in seconds)
+INTERVAL_VISIBLE = 2    # window visible
+INTERVAL_HIDDEN = 30    # window iconified, withdrawn, unmapped, or obscured
+INTERVAL_ACTIVE = 0.5   # operation running (regardless of visibility)
+
+class PollScheduler:
+
+  def __init__(self, interval_callback, visible_interval=INTERVAL_VISIBLE,
+               hidden_interval=INTERVAL_HIDDEN,
+               active_interval=INTERVAL_ACTIVE):
+    self.interval_callback = interval_callback
+    self.visible_interval = visible_interval
+    self.hidden_interval = hidden_interval
+    self.active_interval = active_interval
+
+    self.mapped = True
+    self.iconified = False
+    self.obscured = False
+    self.operations_running = 0
+
+    self.interval = self._choose_interval()
+
+  ### SIGNALS
+
+  def on_window_map_event(self, window, event):
+    self.mapped = True
+    self._update()
+
+  def on_window_unmap_event(self, window, event):
+    self.mapped = False
+    self._update()
+
+  def on_window_state_event(self, window, event):
+    hidden = Gdk.WindowState.ICONIFIED | Gdk.WindowState.WITHDRAWN
+    self.iconified = bool(event.new_window_state & hidden)
+    self._update()
+
+  def on_window_visibility_notify_event(self, window, event):
+    # only delivered by some window managers/compositors
+    self.obscured = event.state == Gdk.VisibilityState.FULLY_OBSCURED
+    self._update()
+
+  ### METHODS
+
+  def watch_window(self, window):
+    # follow window visibility changes
+    window.add_events(Gdk.EventMask.STRUCTURE_MASK |
+                      Gdk.EventMask.VISIBILITY_NOTIFY_MASK)
+    window.connect('map-event', self.on_window_map_event)
+    window.connect('unmap-event', self.on_window_unmap_event)
+    window.connect('window-state-event', self.on_window_state_event)
+    window.connect('visibility-notify-event',
+                   self.on_window_visibility_notify_event)
+
+  def set_operations_running(self, count):
+    self.operations_running = count
+    self._update()
+
+  def _choose_interval(self):
+    if self.operations_running > 0:
+      return self.active_interval
+    if not self.mapped or self.iconified or self.obscured:
+      return self.hidden_interval
+    return self.visible_interval
+
+  def _update(self):
+    # notify interval changes
+    interval = self._choose_interval()
+    if interval != self.interval:
+      self.interval = interval
+      self.interval_callback(interval)
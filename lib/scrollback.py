@@ -0,0 +1,119 @@
+#
+# NAME
+#
+#   scrollback.py
+#
+# DESCRIPTION
+#
+#   Wren GUI application's scrollback spill module. Stores operation output
+#   trimmed from an operation window in a temporary log file and pages it
+#   back in (through mmap) on demand, so long-running operations do not hold
+#   all of their output in memory. Without a disk-backed directory to spill
+#   to, only the most recent output is kept, in memory.
+#
+# AUTHOR
+#
+#   Written by the Wren GUI project developers.
+#
+#
+# The Wren GUI project; Copyright 2015 the Wren GUI project developers.
+# See the COPYRIGHT file in the top-level directory of this distribution
+# for individual attributions.
+#
+# This file is part of the Wren GUI project. It is subject to the license terms
+# in the LICENSE file found in the top-level directory of this distribution.
+# No part of the Wren GUI project, including this file, may be copied,
+# modified, propagated, or distributed except according to the terms contained
+# in the LICENSE file.
+#
+# This program comes with ABSOLUTELY NO WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# LICENSE file found in the top-level directory of this distribution for
+# more details.
+#
+
+import mmap, os, tempfile
+from lib.paths import PATH_SPILL_DIR
+
+# bytes of spilled output shown per page (pages end on line boundaries)
+PAGE_SIZE = 65536
+
+# most recent spilled output (in bytes) kept in memory when it cannot be
+# spilled to disk (older output is dropped, a line at a time)
+MEMORY_LIMIT = 4194304
+
+class SpillLog:
+
+  def __init__(self, directory=PATH_SPILL_DIR, memory_limit=MEMORY_LIMIT):
+    # open an anonymous temporary file (removed when closed) if directory is
+    # a mounted, writable file system; otherwise keep output in memory
+    self.file = None
+    self.buffer = None
+    self.memory_limit = memory_limit
+    if directory is not None and os.path.ismount(directory):
+      try:
+        self.file = tempfile.TemporaryFile(prefix='wren-gui-output-',
+                                           dir=directory)
+      except (IOError, OSError):
+        pass
+    if self.file is None:
+      self.buffer = bytearray()
+    self.size = 0
+    self.map = None
+
+  def write(self, text):
+    # append text (or utf-8 encoded bytes) to the log
+    if not isinstance(text, bytes):
+      text = text.encode('utf-8')
+    if self.file is not None:
+      self.file.write(text)
+      self.size += len(text)
+      return
+    self.buffer.extend(text)
+    if len(self.buffer) > self.memory_limit:
+      # drop the oldest output, up to the end of a line
+      cut = self.buffer.find(b'\n', len(self.buffer) - self.memory_limit)
+      del self.buffer[:cut + 1 if cut >= 0 else len(self.buffer)]
+    self.size = len(self.buffer)
+
+  def page_count(self, page_size=PAGE_SIZE):
+    return max(1, (self.size + page_size - 1) // page_size)
+
+  def page(self, number, page_size=PAGE_SIZE):
+    # return page text (page boundaries are moved to the following newline
+    # so lines are never split between pages)
+    if self.size == 0:
+      return ''
+    log_map = self._map()
+    start = self._line_boundary(log_map, number * page_size) if number else 0
+    end = self._line_boundary(log_map, (number + 1) * page_size)
+    return log_map[start:end].decode('utf-8', 'replace')
+
+  def close(self):
+    if self.map is not None:
+      self.map.close()
+      self.map = None
+    if self.file is not None:
+      self.file.close()
+    self.buffer = None
+
+  def _map(self):
+    # map the log, remapping if it grew since the last mapping
+    if self.buffer is not None:
+      return self.buffer
+    if self.map is None or len(self.map) != self.size:
+      if self.map is not None:
+        self.map.close()
+      self.file.flush()
+      self.map = mmap.mmap(self.file.fileno(), self.size,
+                           access=mmap.ACCESS_READ)
+    return self.map
+
+  def _line_boundary(self, log_map, offset):
+    # offset just past the first newline at or after offset (or end of log)
+    if offset >= self.size:
+      return self.size
+    newline = log_map.find(b'\n', offset)
+    if newline < 0:
+      return self.size
+    return newline + 1
@@ -30,8 +30,15 @@
 # more details.
 #
 
-from lib.pipechain import PipeChain
-from lib.paths import PATH_MOUNT_DIR
+import os, re, select, time
+from collections import namedtuple, OrderedDict
+from lib.paths import PATH_MOUNT_DIR, PATH_PROC_MEMINFO, PATH_PROC_MOUNTINFO
+
+# python 3 has no separate long type
+try:
+  long
+except NameError:
+  long = int
 
 class UsageResult:
   total = ''
@@ -48,98 +55,271 @@ class UsageResult:
     return 'Total:%s Used:%s Free:%s' % (self.total, self.used, self.free)
 
 
+# /proc/meminfo fields retained in memory snapshots [attribute, field name]
+MEMINFO_FIELDS = [['mem_total', 'MemTotal'],
+                  ['mem_free', 'MemFree'],
+                  ['mem_available', 'MemAvailable'],
+                  ['buffers', 'Buffers'],
+                  ['cached', 'Cached'],
+                  ['shmem', 'Shmem'],
+                  ['s_reclaimable', 'SReclaimable'],
+                  ['dirty', 'Dirty'],
+                  ['swap_total', 'SwapTotal'],
+                  ['swap_free', 'SwapFree']]
+
+# raw /proc/meminfo reading (in bytes) with the time it was taken;
+# fields missing from the running kernel (e.g. MemAvailable) are None
+MemInfoSnapshot = namedtuple('MemInfoSnapshot',
+                             ['timestamp'] + [f[0] for f in MEMINFO_FIELDS])
+
+
+def read_proc_file(fd, chunk_size=65536):
+  # read the whole content of an open procfs file (bytes); procfs files are
+  # kept open between readings, as their content is regenerated on every
+  # read from offset zero
+  os.lseek(fd, 0, os.SEEK_SET)
+  chunks = []
+  chunk = os.read(fd, chunk_size)
+  while chunk:
+    chunks.append(chunk)
+    chunk = os.read(fd, chunk_size)
+  return b''.join(chunks)
+
+
+class MemInfoSampler:
+
+  def __init__(self, path=PATH_PROC_MEMINFO):
+    self.path = path
+    self.fd = None
+    self.fields = dict((f[1], f[0]) for f in MEMINFO_FIELDS)
+
+  def sample(self):
+    # read /proc/meminfo once and return a MemInfoSnapshot
+    values = {}
+    for line in self._read().splitlines():
+      name, _, value = line.partition(':')
+      attr = self.fields.get(name)
+      if attr is None:
+        continue
+      value = value.split()
+      try:
+        values[attr] = long(value[0])
+      except (IndexError, ValueError):
+        continue
+      if len(value) > 1 and value[1] == 'kB':
+        values[attr] *= 1024
+    return MemInfoSnapshot(time.time(),
+                           *[values.get(f[0]) for f in MEMINFO_FIELDS])
+
+  def close(self):
+    if self.fd is not None:
+      os.close(self.fd)
+      self.fd = None
+
+  def _read(self):
+    try:
+      if self.fd is None:
+        self.fd = os.open(self.path, os.O_RDONLY)
+      content = read_proc_file(self.fd)
+    except OSError:
+      # reopen on next reading
+      self.close()
+      raise
+    return content.decode('ascii', 'replace')
+
+
+# shared sampler used by MemoryUsage when no snapshot is provided
+_meminfo_sampler = MemInfoSampler()
+
+
 class MemoryUsage:
 
-  def __init__(self):
-    attrs = [['ram', 'Mem'],
-             ['swap', 'Swap'],
-             ['total', 'Total']]
+  def __init__(self, snapshot=None):
+    # take a reading unless one was provided
+    if snapshot is None:
+      try:
+        snapshot = _meminfo_sampler.sample()
+      except (IOError, OSError):
+        pass
+    self.snapshot = snapshot
 
-    # define grep pattern for command filtering
-    grep_str = ''
-    for attr in attrs:
-      if not grep_str:
-        grep_str += '^\(%s' % attr[1] 
-      else:
-        grep_str += '\|%s' % attr[1]
-    grep_str += '\):'
-
-    # define commands
-    usage_commands=[['free', '-bt'],
-                   ['grep', grep_str],
-                   ['tr', '-s', ' '],
-                   ['cut', '-d', ' ', '-f', '1-4']]
-
-    # pipe commands and store output
-    usage_output = PipeChain(usage_commands).output
-
-    # filter each stat into associated lists
-    for attr in attrs:
-      values = PipeChain([
-          ['echo', usage_output],
-          ['grep', '^%s:' % attr[1]],
-          ['cut', '-d', ' ', '-f', '2-4']
-        ]).output.strip().split()
-
-      # convert strings to numbers and store
-      if len(values) > 0:
-        for i,v in enumerate(values):
-          try:
-            values[i] = long(v)
-          except ValueError:
-            pass
-        setattr(self, attr[0], UsageResult(values))
-      else:
-        setattr(self, attr[0], UsageResult())
+    # calculate stats as reported by "free -bt" (used includes caches)
+    ram = swap = None
+    if snapshot is not None:
+      if snapshot.mem_total is not None and snapshot.mem_free is not None:
+        ram = [snapshot.mem_total,
+               snapshot.mem_total - snapshot.mem_free,
+               snapshot.mem_free]
+      if snapshot.swap_total is not None and snapshot.swap_free is not None:
+        swap = [snapshot.swap_total,
+                snapshot.swap_total - snapshot.swap_free,
+                snapshot.swap_free]
+
+    # store results (empty when unavailable)
+    self.ram = UsageResult(ram)
+    self.swap = UsageResult(swap)
+    if ram is not None and swap is not None:
+      self.total = UsageResult([r + s for r, s in zip(ram, swap)])
+    else:
+      self.total = UsageResult()
+
+
+# mount point entry from /proc/self/mountinfo
+MountEntry = namedtuple('MountEntry', ['mount_point', 'major', 'minor',
+                                       'fstype', 'source'])
+
+
+class MountIndex:
+
+  def __init__(self, path=PATH_PROC_MOUNTINFO, mount_dir=PATH_MOUNT_DIR):
+    self.path = path
+    self.mount_dir = mount_dir
+    self.fd = None
+    self.mounts = {}
+    self.poller = select.poll()
+
+  def fileno(self):
+    # descriptor signalling POLLPRI on mount table changes (opened on demand)
+    if self.fd is None:
+      self.refresh()
+    return self.fd
+
+  def get(self, name):
+    # return the MountEntry mounted at mount_dir/name, or None
+    return self.mounts.get('%s/%s' % (self.mount_dir, name))
+
+  def update(self):
+    # rebuild the index only if the mount table changed since the last read
+    if self.fd is None or self.poller.poll(0):
+      self.refresh()
+      return True
+    return False
+
+  def refresh(self):
+    # (re)read mountinfo and rebuild the index of mounts below mount_dir
+    try:
+      if self.fd is None:
+        self.fd = os.open(self.path, os.O_RDONLY)
+        self.poller.register(self.fd, select.POLLPRI | select.POLLERR)
+      content = read_proc_file(self.fd)
+    except OSError:
+      self.close()
+      self.mounts = {}
+      return
+
+    # format: id parent major:minor root mount_point options [optional] -
+    #         fstype source super_options
+    prefix = self.mount_dir + '/'
+    mounts = {}
+    for line in content.decode('utf-8', 'replace').splitlines():
+      fields = line.split()
+      try:
+        mount_point = _unescape_mount_field(fields[4])
+        if not mount_point.startswith(prefix):
+          continue
+        major, minor = fields[2].split(':')
+        separator = fields.index('-', 6)
+        # later entries stack on top of earlier ones
+        mounts[mount_point] = MountEntry(mount_point, int(major), int(minor),
+                                         fields[separator + 1],
+                                         fields[separator + 2])
+      except (IndexError, ValueError):
+        continue
+    self.mounts = mounts
+
+  def close(self):
+    if self.fd is not None:
+      self.poller.unregister(self.fd)
+      os.close(self.fd)
+      self.fd = None
+
+
+def _unescape_mount_field(value):
+  # decode octal escapes (e.g. "\040" for space) used in mountinfo paths
+  return re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), value)
+
+
+# shared mount index used by DiskUsage when none is provided
+_mount_index = MountIndex()
 
 
 class DiskUsage:
 
-  def __init__(self):
+  def __init__(self, mount_index=None):
     attrs = [['device', '00-device'],
              ['save', '04-save']]
 
-    # define grep pattern for command filtering
-    grep_str = ''
-    for attr in attrs:
-      if not grep_str:
-        grep_str += ' %s\/\(%s' % (PATH_MOUNT_DIR, attr[1]) 
-      else:
-        grep_str += '\|%s' % attr[1]
-    grep_str += '\)$'
-
-    # define commands
-    usage_commands=[['df', '-B1'],
-                   ['grep', grep_str],
-                   ['tr', '-s', ' '],
-                   ['cut', '-d', ' ', '-f', '2-']]
-
-    # pipe commands and store output
-    usage_output = PipeChain(usage_commands).output
-
-    # filter each stat into associated lists
+    # rebuild the mount index if mounts changed since the last reading
+    if mount_index is None:
+      mount_index = _mount_index
+    mount_index.update()
+
+    # take a statvfs reading of each mounted file system
     for attr in attrs:
-      values = PipeChain([
-          ['echo', usage_output],
-          ['grep', '\/%s$' % attr[1]],
-          ['cut', '-d', ' ', '-f', '1-3']
-        ]).output.strip().split()
-
-      # convert strings to numbers and store
-      if len(values) > 0:
-        for i,v in enumerate(values):
-          try:
-            values[i] = long(v)
-          except ValueError:
-            pass
-        setattr(self, attr[0], UsageResult(values))
-      else:
-        setattr(self, attr[0], UsageResult())
+      values = None
+      mount = mount_index.get(attr[1])
+      if mount is not None:
+        try:
+          stat = os.statvfs(mount.mount_point)
+          values = [stat.f_blocks * stat.f_frsize,
+                    (stat.f_blocks - stat.f_bfree) * stat.f_frsize,
+                    stat.f_bavail * stat.f_frsize]
+        except OSError:
+          pass
+      setattr(self, attr[0], UsageResult(values))
+
+
+def usage_snapshot(memory_usage, disk_usage, timestamp):
+  # usage readings as a JSON-serializable dict (bytes; None if unavailable)
+  snapshot = {
+    'timestamp': timestamp,
+    'memory': {
+      'ram': _usage_result(memory_usage.ram),
+      'swap': _usage_result(memory_usage.swap),
+      'total': _usage_result(memory_usage.total)
+    },
+    'disk': {
+      'device': _usage_result(disk_usage.device),
+      'save': _usage_result(disk_usage.save)
+    },
+    'memory_free_after_save': None
+  }
 
+  # memory remaining if the active save filled up (as displayed by the GUI)
+  memory_free = snapshot['memory']['total']['free']
+  save_free = snapshot['disk']['save']['free']
+  if memory_free is not None and save_free is not None:
+    snapshot['memory_free_after_save'] = max(0, memory_free - save_free)
+  return snapshot
+
+
+def _usage_result(usage_result):
+  result = {}
+  for key in ['total', 'used', 'free']:
+    value = getattr(usage_result, key)
+    result[key] = value if value != '' else None
+  return result
+
+
+# number of bytes_to_human results kept (least recently used dropped first)
+BYTES_TO_HUMAN_CACHE_SIZE = 256
+
+_bytes_to_human_cache = OrderedDict()
 
 def bytes_to_human(byte_count, max_size=None):
-  # format byte count to human readable size
+  # format byte count to human readable size (cached)
   # max_size (char, optional) determines the highest division
+  key = (byte_count, max_size)
+  try:
+    result = _bytes_to_human_cache.pop(key)
+  except KeyError:
+    result = _bytes_to_human(byte_count, max_size)
+    if len(_bytes_to_human_cache) >= BYTES_TO_HUMAN_CACHE_SIZE:
+      _bytes_to_human_cache.popitem(last=False)
+  _bytes_to_human_cache[key] = result
+  return result
+
+def _bytes_to_human(byte_count, max_size=None):
   result = long(byte_count)
   size = 'B'
   for i,v in enumerate(['K', 'M', 'G', 'T', 'P']):